@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+# Our MAVLink address. The system id stays the GCS default 255 (ArduPilot only takes RC
+# overrides from SYSID_MYGCS); the component id is our own, so COMMAND_ACKs addressed to
+# another GCS on 255 behind the router (Mission Planner / QGC send as 255/190) are not ours.
+GCS_SYSTEM_ID = 255
+GCS_COMPONENT_ID = 25  # MAV_COMP_ID_USER1
+
+
+def is_our_ack(msg: Any) -> bool:
+    """COMMAND_ACK addressed to us; 0 is a broadcast (older firmware leaves target_component 0)."""
+    return getattr(msg, "target_system", 0) in (0, GCS_SYSTEM_ID) and getattr(msg, "target_component", 0) in (
+        0,
+        GCS_COMPONENT_ID,
+    )
+
+DEFAULT_ACK_TIMEOUT_S = 1.5
+DEFAULT_RETRIES = 2
+# While the autopilot reports MAV_RESULT_IN_PROGRESS we keep waiting up to this long.
+IN_PROGRESS_TIMEOUT_S = 10.0
+
+MAV_RESULT_ACCEPTED = 0
+MAV_RESULT_IN_PROGRESS = 5
+_RESULT_NAMES = {
+    0: "ACCEPTED",
+    1: "TEMPORARILY_REJECTED",
+    2: "DENIED",
+    3: "UNSUPPORTED",
+    4: "FAILED",
+    5: "IN_PROGRESS",
+    6: "CANCELLED",
+    7: "COMMAND_LONG_ONLY",
+    8: "COMMAND_INT_ONLY",
+}
+
+# Round-trip latency buckets, ms (upper bounds; the last bucket is open-ended).
+LATENCY_BUCKETS_MS = (10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+def result_name(result: int | None) -> str:
+    if result is None:
+        return "NO_ACK"
+    return _RESULT_NAMES.get(result, str(result))
+
+
+@dataclass
+class LatencyHistogram:
+    counts: list[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS_MS) + 1))
+    total_ms: float = 0.0
+    min_ms: float | None = None
+    max_ms: float | None = None
+    timeouts: int = 0
+
+    def record(self, ms: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.total_ms += ms
+        self.min_ms = ms if self.min_ms is None else min(self.min_ms, ms)
+        self.max_ms = ms if self.max_ms is None else max(self.max_ms, ms)
+
+    def to_dict(self) -> dict[str, Any]:
+        n = sum(self.counts)
+        labels = [f"<={b}" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"]
+        return {
+            "count": n,
+            "timeouts": self.timeouts,
+            "avg_ms": round(self.total_ms / n, 2) if n else None,
+            "min_ms": None if self.min_ms is None else round(self.min_ms, 2),
+            "max_ms": None if self.max_ms is None else round(self.max_ms, 2),
+            "buckets_ms": dict(zip(labels, self.counts)),
+        }
+
+
+@dataclass
+class AckResult:
+    command: str
+    cmd_id: int
+    result: int | None  # MAV_RESULT, None => no ACK
+    attempts: int
+    latency_ms: float | None
+    preempted: bool = False  # an emergency command with the same MAV_CMD id took over
+
+    @property
+    def ok(self) -> bool:
+        return self.result == MAV_RESULT_ACCEPTED
+
+    @property
+    def result_name(self) -> str:
+        return "PREEMPTED" if self.preempted else result_name(self.result)
+
+
+@dataclass
+class _Waiter:
+    loop: asyncio.AbstractEventLoop
+    # A queue, not a future: IN_PROGRESS acks may precede the final one.
+    q: asyncio.Queue = field(default_factory=asyncio.Queue)
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+    preempted: bool = False
+
+
+# Put into a waiter's queue when another command takes its MAV_CMD id over.
+_PREEMPTED = (None, None)
+
+
+class CommandAckTracker:
+    """
+    Matches COMMAND_ACK messages from the RX side to commands waiting for them.
+
+    An ACK only carries the MAV_CMD id, so at most one command per id is in flight and
+    each ACK goes to exactly one waiter. A second command with the same id (arm, then
+    another arm) waits for the first exchange to finish; a preempting one (disarm, the
+    EMERGENCY lane) ends the pending exchange at once and takes its place, so it never
+    waits out an unanswered arm's retries. on_ack() may be called from the RX thread or
+    the event loop; the waiter is always resolved on the loop.
+    """
+
+    def __init__(self) -> None:
+        self._pending: dict[int, _Waiter] = {}
+        self._lock = threading.Lock()
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self.unmatched = 0
+
+    async def _claim(self, cmd_id: int, preempt: bool) -> _Waiter:
+        while True:
+            with self._lock:
+                current = self._pending.get(cmd_id)
+            if current is None:
+                break
+            if preempt:
+                current.preempted = True
+                current.q.put_nowait(_PREEMPTED)
+                break
+            await current.done.wait()
+        waiter = _Waiter(asyncio.get_running_loop())
+        with self._lock:
+            self._pending[cmd_id] = waiter
+        return waiter
+
+    def _forget(self, cmd_id: int, waiter: _Waiter) -> None:
+        with self._lock:
+            if self._pending.get(cmd_id) is waiter:
+                del self._pending[cmd_id]
+        waiter.done.set()
+
+    def on_ack(self, msg: Any) -> None:
+        cmd_id = getattr(msg, "command", None)
+        with self._lock:
+            waiter = self._pending.get(cmd_id)  # type: ignore[arg-type]
+        if waiter is None:
+            self.unmatched += 1
+            return
+        try:
+            waiter.loop.call_soon_threadsafe(waiter.q.put_nowait, (getattr(msg, "result", None), time.monotonic()))
+        except RuntimeError:
+            pass  # loop closed
+
+    async def run(
+        self,
+        command: str,
+        cmd_id: int,
+        send: Callable[[int], Awaitable[float]],
+        *,
+        timeout_s: float = DEFAULT_ACK_TIMEOUT_S,
+        retries: int = DEFAULT_RETRIES,
+        preempt: bool = False,
+    ) -> AckResult:
+        """
+        send(confirmation) writes the command and returns the monotonic time it went out.
+        Retries on timeout with confirmation incremented, as the MAVLink command protocol
+        asks; TEMPORARILY_REJECTED is retried too. Records the ACK round trip per command.
+        Waits for an earlier command with the same id to finish first, unless `preempt`.
+        """
+        hist = self.histograms.setdefault(command, LatencyHistogram())
+        waiter = await self._claim(cmd_id, preempt)
+        q = waiter.q
+        result: int | None = None
+        latency_ms: float | None = None
+        attempt = 0
+        try:
+            for attempt in range(1, retries + 2):
+                if waiter.preempted:
+                    break
+                sent_ts = await send(attempt - 1)
+                if waiter.preempted:
+                    break
+                deadline = sent_ts + timeout_s
+                result = None
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        result, ack_ts = await asyncio.wait_for(q.get(), remaining)
+                    except asyncio.TimeoutError:
+                        result = None
+                        break
+                    if ack_ts is None:  # _PREEMPTED
+                        break
+                    if ack_ts < sent_ts:
+                        continue  # late ACK of an earlier attempt
+                    latency_ms = (ack_ts - sent_ts) * 1000.0
+                    if result == MAV_RESULT_IN_PROGRESS:
+                        deadline = ack_ts + IN_PROGRESS_TIMEOUT_S
+                        continue
+                    break
+                if waiter.preempted:
+                    break
+                if result is None:
+                    hist.timeouts += 1
+                    continue
+                if result == 1 and attempt <= retries:  # TEMPORARILY_REJECTED
+                    await asyncio.sleep(min(timeout_s, 0.2))
+                    continue
+                break
+        finally:
+            self._forget(cmd_id, waiter)
+        if waiter.preempted:
+            return AckResult(command, cmd_id, None, attempt, None, preempted=True)
+        if result is not None and latency_ms is not None:
+            hist.record(latency_ms)
+        return AckResult(command, cmd_id, result, attempt, None if result is None else latency_ms)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "unmatched": self.unmatched,
+            "latency": {name: h.to_dict() for name, h in self.histograms.items()},
+        }
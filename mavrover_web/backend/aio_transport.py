@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import asyncio
+import errno
+import os
+import threading
+from typing import Any, Callable
+
+from .acks import GCS_COMPONENT_ID, GCS_SYSTEM_ID
+from .mavlink import MavlinkError
+
+# Ports the asyncio transport handles; everything else (replay:, tcp:, Windows COM ports)
+# stays on the threaded pymavlink path.
+ASYNC_UDP_PREFIXES = ("udpin:", "udpout:", "udp:")
+
+BatchCallback = Callable[[list], None]
+
+# MAV_TYPE_GCS, MAV_TYPE_GIMBAL, MAV_TYPE_ADSB, MAV_TYPE_ONBOARD_CONTROLLER
+_NOT_VEHICLE_TYPES = frozenset((6, 26, 27, 18))
+
+
+def supports_async(port: str) -> bool:
+    if port.startswith(ASYNC_UDP_PREFIXES):
+        return True
+    # Serial via loop.add_reader on a non-blocking tty fd: POSIX selector loops only.
+    return os.name == "posix" and port.startswith("/dev/")
+
+
+def _parse_addr(spec: str) -> tuple[str, int]:
+    host, _, port = spec.rpartition(":")
+    return host or "0.0.0.0", int(port)
+
+
+def _open_tty(path: str, baudrate: int) -> int:
+    import termios
+    import tty
+
+    speed = getattr(termios, f"B{baudrate}", None)
+    if speed is None:
+        raise MavlinkError(f"Unsupported baudrate: {baudrate}")
+    fd = os.open(path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    try:
+        tty.setraw(fd)
+        attrs = termios.tcgetattr(fd)
+        # As pyserial does by default: no hardware or software flow control, ignore modem lines.
+        attrs[0] &= ~(termios.IXON | termios.IXOFF | getattr(termios, "IXANY", 0))
+        attrs[2] &= ~getattr(termios, "CRTSCTS", 0)
+        attrs[2] |= termios.CLOCAL | termios.CREAD
+        attrs[4] = attrs[5] = speed  # ispeed, ospeed
+        termios.tcsetattr(fd, termios.TCSANOW, attrs)
+    except Exception:
+        os.close(fd)
+        raise
+    return fd
+
+
+class AsyncMavlinkConnection:
+    """
+    Event-loop MAVLink link: bytes arrive via loop.add_reader (serial) or a
+    DatagramProtocol (UDP), are parsed in place by pymavlink's MAVLink parser and
+    delivered to `on_batch` as one list per read. Sends (`mav.*_send`, write())
+    go straight to the fd/transport without a thread hop.
+
+    Duck-types the part of pymavlink's mavfile that MavlinkClient uses
+    (mav, target_system/component, mode_mapping, write, close), so all
+    command helpers work unchanged on top of it.
+    """
+
+    is_async = True
+
+    def __init__(self, port: str, baudrate: int, on_batch: BatchCallback) -> None:
+        from pymavlink.dialects.v20 import ardupilotmega as mavlink2
+
+        self.port = port
+        self.baudrate = baudrate
+        self.on_batch = on_batch
+        self.mav = mavlink2.MAVLink(self, srcSystem=GCS_SYSTEM_ID, srcComponent=GCS_COMPONENT_ID)
+        self.mav.robust_parsing = True
+        self.target_system = 0
+        self.target_component = 0
+        self.mav_type: int | None = None
+        self.closed = asyncio.Event()
+        self.error: BaseException | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: int | None = None
+        self._fd: int | None = None
+        self._out = bytearray()  # serial bytes not yet accepted by the fd
+        self._udp: asyncio.DatagramTransport | None = None
+        self._udp_peer: tuple[str, int] | None = None
+
+    # --- lifecycle ---
+
+    async def open(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        self._loop_thread = threading.get_ident()
+        port = self.port
+        if port.startswith(ASYNC_UDP_PREFIXES):
+            kind, _, addr = port.partition(":")
+            host, p = _parse_addr(addr)
+            if kind == "udpout":
+                self._udp_peer = (host, p)
+                self._udp, _ = await loop.create_datagram_endpoint(lambda: _Datagram(self), remote_addr=(host, p))
+            else:
+                self._udp, _ = await loop.create_datagram_endpoint(lambda: _Datagram(self), local_addr=(host, p))
+            return
+        try:
+            self._fd = _open_tty(port, self.baudrate)
+        except OSError as e:
+            raise MavlinkError(f"Cannot open {port}: {e}") from e
+        loop.add_reader(self._fd, self._on_readable)
+
+    def close(self) -> None:
+        if self._fd is not None and self._loop is not None:
+            self._loop.remove_reader(self._fd)
+            self._loop.remove_writer(self._fd)
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = None
+        if self._udp is not None:
+            self._udp.close()
+            self._udp = None
+        self.closed.set()
+
+    def _fail(self, e: BaseException) -> None:
+        if self.error is None:
+            self.error = e
+        self.close()
+
+    # --- RX ---
+
+    def _on_readable(self) -> None:
+        try:
+            data = os.read(self._fd, 4096) if self._fd is not None else b""
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self._fail(e)
+            return
+        if not data:
+            self._fail(MavlinkError(f"{self.port}: device closed"))
+            return
+        self._feed(data)
+
+    def _feed(self, data: bytes) -> None:
+        msgs = self.mav.parse_buffer(data)
+        if not msgs:
+            return
+        for msg in msgs:
+            if msg.get_type() == "HEARTBEAT":
+                self._track_vehicle(msg)
+        self.on_batch(msgs)
+
+    def _track_vehicle(self, msg: Any) -> None:
+        # Same rule as mavfile.probably_vehicle_heartbeat: lock onto the first vehicle.
+        from pymavlink.dialects.v20 import ardupilotmega as mavlink2
+
+        if msg.type in _NOT_VEHICLE_TYPES or msg.autopilot == mavlink2.MAV_AUTOPILOT_INVALID:
+            return
+        if not self.target_system:
+            self.target_system = msg.get_srcSystem()
+            self.target_component = msg.get_srcComponent()
+        if msg.get_srcSystem() == self.target_system:
+            self.mav_type = msg.type  # for mode_mapping()
+
+    # --- TX ---
+
+    def write(self, buf: bytes) -> None:
+        """Called by pymavlink's mav.send() and by MavlinkClient.write_raw()."""
+        if self._loop is None or self.closed.is_set():
+            raise MavlinkError("Not connected")
+        if threading.get_ident() != self._loop_thread:
+            # Router uplink threads: hand the frame over to the loop.
+            self._loop.call_soon_threadsafe(self._write, bytes(buf))
+            return
+        self._write(buf)
+
+    def _write(self, buf: bytes) -> None:
+        if self._udp is not None:
+            if self._udp_peer is not None:
+                self._udp.sendto(buf, None if self.port.startswith("udpout:") else self._udp_peer)
+            return
+        if self._fd is None:
+            return
+        if self._out:
+            self._out += buf
+            return
+        try:
+            n = os.write(self._fd, buf)
+        except BlockingIOError:
+            n = 0
+        except OSError as e:
+            self._fail(e)
+            return
+        if n < len(buf):
+            self._out += buf[n:]
+            assert self._loop is not None
+            self._loop.add_writer(self._fd, self._on_writable)
+
+    def _on_writable(self) -> None:
+        if self._fd is None:
+            return
+        try:
+            n = os.write(self._fd, self._out)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self._fail(e)
+            return
+        del self._out[:n]
+        if not self._out and self._loop is not None:
+            self._loop.remove_writer(self._fd)
+
+    # --- mavfile-compatible helpers used by MavlinkClient ---
+
+    def mode_mapping(self) -> dict[str, int]:
+        from pymavlink import mavutil
+
+        if self.mav_type is None:
+            return {}
+        return mavutil.mode_mapping_byname(self.mav_type) or {}
+
+
+class _Datagram(asyncio.DatagramProtocol):
+    def __init__(self, conn: AsyncMavlinkConnection) -> None:
+        self.conn = conn
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        self.conn._udp_peer = addr
+        self.conn._feed(data)
+
+    def error_received(self, exc: Exception) -> None:
+        # ICMP port unreachable etc. on udpout: the GCS side is not up yet; keep going.
+        if getattr(exc, "errno", None) not in (errno.ECONNREFUSED, None):
+            self.conn._fail(exc)
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        if exc is not None:
+            self.conn._fail(exc)
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator
+
+import anyio
+
+from .codec import packb
+from .data_model import TELEMETRY_GROUPS
+from .telemetry import TelemetrySnapshot, TelemetryState
+
+# Delta subscribers still get a full frame this often, so a client that missed
+# something (or a proxy that dropped a message) converges without asking.
+KEYFRAME_INTERVAL_S = 10.0
+
+# Clients woken by the same change within this window share one rendered frame
+# (only the volatile heartbeat age / timestamp would differ).
+FRAME_REUSE_S = 0.05
+
+DEFAULT_MAX_RATE_HZ = 10.0
+DEFAULT_MIN_RATE_HZ = 1.0
+
+
+class ChangeNotifier:
+    """
+    Thread-safe bridge from the MAVLink RX thread into the event loop.
+
+    notify() may be called from any thread (and many times per message); it schedules
+    at most one wakeup at a time. Async waiters grab event() and await it.
+    """
+
+    def __init__(self) -> None:
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._event: asyncio.Event | None = None
+        self._scheduled = False
+
+    def event(self) -> asyncio.Event:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._event is None:
+            self._loop = loop
+            self._event = asyncio.Event()
+        return self._event
+
+    def notify(self) -> None:
+        loop = self._loop
+        if loop is None or self._scheduled:
+            return
+        self._scheduled = True
+        try:
+            loop.call_soon_threadsafe(self._fire)
+        except RuntimeError:
+            # loop closed (shutdown)
+            self._scheduled = False
+
+    def kick(self) -> None:
+        """Wake all waiters now (event-loop thread only), e.g. after a subscription change."""
+        self._fire()
+
+    def _fire(self) -> None:
+        self._scheduled = False
+        ev = self._event
+        self._event = asyncio.Event()
+        if ev is not None:
+            ev.set()
+
+
+@dataclass(frozen=True)
+class TelemetryFrame:
+    version: int
+    # str for JSON (text WS message), bytes for msgpack (binary WS message)
+    payload: str | bytes
+
+
+@dataclass
+class TelemetrySubscription:
+    """Per-client telemetry stream state."""
+
+    delta: bool = False
+    # "json" (default, readable in devtools) or "msgpack" (binary frames)
+    encoding: str = "json"
+    # Frames are sent as soon as the state changes, but not more often than max_rate_hz;
+    # with no changes a frame still goes out every 1/min_rate_hz (heartbeat age refresh).
+    max_rate_hz: float = DEFAULT_MAX_RATE_HZ
+    min_rate_hz: float = DEFAULT_MIN_RATE_HZ
+    # Top-level fields the client subscribed to (None => everything).
+    fields: tuple[str, ...] | None = None
+    # Version the client already has (None => next frame must be a keyframe).
+    base: int | None = None
+    last_keyframe_ts: float = 0.0
+
+    def __post_init__(self) -> None:
+        self.max_rate_hz = min(50.0, max(0.1, float(self.max_rate_hz)))
+        self.min_rate_hz = min(self.max_rate_hz, max(0.05, float(self.min_rate_hz)))
+
+    def set_groups(self, groups: list[str] | None) -> None:
+        if groups is None:
+            self.fields = None
+        else:
+            names = ["status", *groups]
+            self.fields = tuple(f for g in TELEMETRY_GROUPS if g in names for f in TELEMETRY_GROUPS[g])
+        # Different field set => the client needs a fresh keyframe.
+        self.resync()
+
+    def resync(self) -> None:
+        self.base = None
+
+
+class TelemetryBroadcaster:
+    """
+    Builds encoded telemetry frames and hands the same frame to every /ws client.
+
+    Clients are woken by the ChangeNotifier when the RX thread publishes a new snapshot,
+    so simultaneous wakeups share a rendered frame. Nothing here takes a lock: frames are
+    rendered from the immutable TelemetrySnapshot, and cached by its version.
+    Delta frames are cached per base version, so clients in lockstep share them as well.
+    """
+
+    def __init__(self, state: TelemetryState, notifier: ChangeNotifier):
+        self.state = state
+        self.notifier = notifier
+        self._snap = TelemetrySnapshot()
+        self._volatile: dict[str, Any] = {}
+        self._loaded_ts = 0.0
+        self._frames: dict[Any, TelemetryFrame] = {}
+
+    def _load(self) -> None:
+        snap = self._snap = self.state.snapshot
+        self._volatile = {
+            "last_heartbeat_age_s": snap.heartbeat_age_s(),
+            "timestamp_ms": snap.timestamp_ms,
+        }
+        self._frames.clear()
+
+    def _render(self, key: Any) -> TelemetryFrame:
+        snap = self._snap
+        version = snap.version
+        kind, base, fields, encoding = key
+        if kind == "full":
+            if fields is None:
+                data = dict(snap.data)
+            else:
+                data = {name: snap.data[name] for name in fields}
+            data.update(self._volatile)
+            # Same shape as TelemetryEvent(...).model_dump()
+            payload = {"type": "telemetry", "version": version, "data": data}
+        else:
+            versions = snap.field_versions
+            names = versions if fields is None else fields
+            data = {name: snap.data[name] for name in names if versions.get(name, 0) > base}
+            data.update(self._volatile)
+            # Same shape as TelemetryDeltaEvent(...).model_dump()
+            payload = {"type": "telemetry_delta", "version": version, "base": base, "data": data}
+        if encoding == "msgpack":
+            return TelemetryFrame(version=version, payload=packb(payload))
+        return TelemetryFrame(version=version, payload=json.dumps(payload, ensure_ascii=False))
+
+    def frame(self, sub: TelemetrySubscription | None = None) -> TelemetryFrame:
+        now = time.monotonic()
+        if self.state.snapshot.version != self._snap.version or now - self._loaded_ts > FRAME_REUSE_S:
+            self._load()
+            self._loaded_ts = now
+
+        fields = None if sub is None else sub.fields
+        encoding = "json" if sub is None else sub.encoding
+        key: Any = ("full", None, fields, encoding)
+        if sub is not None and sub.delta and sub.base is not None:
+            if now - sub.last_keyframe_ts < KEYFRAME_INTERVAL_S:
+                key = ("delta", sub.base, fields, encoding)
+
+        frame = self._frames.get(key)
+        if frame is None:
+            frame = self._render(key)
+            self._frames[key] = frame
+
+        if sub is not None:
+            if key[0] == "full":
+                sub.last_keyframe_ts = now
+            sub.base = frame.version
+        return frame
+
+    def _pending(self, sub: TelemetrySubscription) -> bool:
+        """Has anything the subscriber cares about changed since its last frame?"""
+        if sub.base is None:
+            return True
+        snap = self.state.snapshot
+        if snap.version == sub.base:
+            return False
+        if sub.fields is None:
+            return True
+        return any(snap.field_versions.get(name, 0) > sub.base for name in sub.fields)
+
+    async def subscribe(self, sub: TelemetrySubscription) -> AsyncIterator[TelemetryFrame]:
+        while True:
+            sent_ts = time.monotonic()
+            yield self.frame(sub)
+
+            # Coalesce bursts: never faster than max_rate_hz.
+            # Rates are re-read every round, a subscribe message may change them.
+            delay = sent_ts + 1.0 / sub.max_rate_hz - time.monotonic()
+            if delay > 0:
+                await anyio.sleep(delay)
+
+            # Wait for a relevant change, or send a keepalive frame at min_rate_hz.
+            while True:
+                ev = self.notifier.event()
+                if self._pending(sub):
+                    break
+                timeout = sent_ts + 1.0 / sub.min_rate_hz - time.monotonic()
+                if timeout <= 0:
+                    break
+                with anyio.move_on_after(timeout):
+                    await ev.wait()
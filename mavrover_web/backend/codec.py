@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import struct
+from typing import Any
+
+# Minimal MessagePack encoder for binary /ws telemetry frames (no extra dependency).
+# Only the types TelemetryEvent actually contains are supported.
+#
+# Floats are packed as float32 except for fields where 24 bits of mantissa are not
+# enough (GPS coordinates: float32 would cost ~0.5 m of precision).
+FLOAT64_KEYS = frozenset({"lat", "lon"})
+
+_f32 = struct.Struct(">Bf").pack
+_f64 = struct.Struct(">Bd").pack
+
+
+def _pack_int(out: bytearray, v: int) -> None:
+    if 0 <= v <= 0x7F:
+        out.append(v)
+    elif -32 <= v < 0:
+        out.append(v & 0xFF)
+    elif 0 <= v <= 0xFF:
+        out += struct.pack(">BB", 0xCC, v)
+    elif 0 <= v <= 0xFFFF:
+        out += struct.pack(">BH", 0xCD, v)
+    elif 0 <= v <= 0xFFFFFFFF:
+        out += struct.pack(">BI", 0xCE, v)
+    elif 0 <= v:
+        out += struct.pack(">BQ", 0xCF, v)
+    elif -0x80 <= v:
+        out += struct.pack(">Bb", 0xD0, v)
+    elif -0x8000 <= v:
+        out += struct.pack(">Bh", 0xD1, v)
+    elif -0x80000000 <= v:
+        out += struct.pack(">Bi", 0xD2, v)
+    else:
+        out += struct.pack(">Bq", 0xD3, v)
+
+
+def _pack_str(out: bytearray, s: str) -> None:
+    b = s.encode("utf-8")
+    n = len(b)
+    if n <= 31:
+        out.append(0xA0 | n)
+    elif n <= 0xFF:
+        out += struct.pack(">BB", 0xD9, n)
+    elif n <= 0xFFFF:
+        out += struct.pack(">BH", 0xDA, n)
+    else:
+        out += struct.pack(">BI", 0xDB, n)
+    out += b
+
+
+def _pack(out: bytearray, obj: Any, key: str | None) -> None:
+    if obj is None:
+        out.append(0xC0)
+    elif obj is True:
+        out.append(0xC3)
+    elif obj is False:
+        out.append(0xC2)
+    elif isinstance(obj, int):
+        _pack_int(out, obj)
+    elif isinstance(obj, float):
+        out += _f64(0xCB, obj) if key in FLOAT64_KEYS else _f32(0xCA, obj)
+    elif isinstance(obj, str):
+        _pack_str(out, obj)
+    elif isinstance(obj, dict):
+        n = len(obj)
+        if n <= 15:
+            out.append(0x80 | n)
+        elif n <= 0xFFFF:
+            out += struct.pack(">BH", 0xDE, n)
+        else:
+            out += struct.pack(">BI", 0xDF, n)
+        for k, v in obj.items():
+            _pack_str(out, str(k))
+            _pack(out, v, k)
+    elif isinstance(obj, (list, tuple)):
+        n = len(obj)
+        if n <= 15:
+            out.append(0x90 | n)
+        elif n <= 0xFFFF:
+            out += struct.pack(">BH", 0xDC, n)
+        else:
+            out += struct.pack(">BI", 0xDD, n)
+        for v in obj:
+            _pack(out, v, key)
+    else:
+        raise TypeError(f"msgpack: unsupported type {type(obj).__name__}")
+
+
+def packb(obj: Any) -> bytes:
+    out = bytearray()
+    _pack(out, obj, None)
+    return bytes(out)
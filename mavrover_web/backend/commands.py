@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Callable
+
+from .data_model import CommandRequest
+
+# MAV_CMD_COMPONENT_ARM_DISARM
+_MAV_CMD_ARM_DISARM = 400
+
+
+class CommandLane(IntEnum):
+    """Lower value = sent first."""
+
+    EMERGENCY = 0  # disarm
+    MODE = 1  # set_mode
+    RC = 2  # rc_override (joystick stream)
+    GENERIC = 3  # arm, reboot, command_long, ping
+
+
+def command_lane(cmd: CommandRequest) -> CommandLane:
+    if cmd.command == "disarm":
+        return CommandLane.EMERGENCY
+    if cmd.command == "command_long":
+        # A raw COMMAND_LONG disarm (400, param1=0) is still a disarm.
+        try:
+            if int(cmd.params.get("cmd_id", 0)) == _MAV_CMD_ARM_DISARM and float(cmd.params.get("p1", 1)) == 0:
+                return CommandLane.EMERGENCY
+        except (TypeError, ValueError):
+            pass
+        return CommandLane.GENERIC
+    if cmd.command == "set_mode":
+        return CommandLane.MODE
+    if cmd.command == "rc_override":
+        return CommandLane.RC
+    return CommandLane.GENERIC
+
+
+def coalesce_key(cmd: CommandRequest) -> str | None:
+    """Commands where only the latest queued value matters share a key."""
+    if cmd.command in ("rc_override", "set_mode"):
+        return cmd.command
+    return None
+
+
+@dataclass(order=True)
+class _Pending:
+    lane: int
+    seq: int
+    fn: Callable[[], Any] = field(compare=False)
+    inline: bool = field(compare=False)
+    key: str | None = field(compare=False, default=None)
+    queued_ts: float = field(compare=False, default=0.0)
+    futures: list[asyncio.Future] = field(compare=False, default_factory=list)
+
+
+class CommandSender:
+    """
+    Single command-TX worker for one vehicle.
+
+    Commands wait in a priority queue (EMERGENCY > MODE > RC > GENERIC, FIFO within a
+    lane) and go out one at a time. A queued rc_override / set_mode is overwritten by
+    a newer one instead of queueing behind it; every caller of the coalesced entry
+    gets the result of the write that actually went out.
+
+    Asyncio links write inline on the loop. Blocking pymavlink links write on the
+    sender's own single thread, never on anyio's shared thread pool, so a DISARM
+    does not wait for a free slot behind /api/check probes.
+    """
+
+    def __init__(self, name: str = "cmd") -> None:
+        self.name = name
+        self._heap: list[_Pending] = []
+        self._keyed: dict[str, _Pending] = {}
+        self._seq = itertools.count()
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        # stats
+        self.sent = [0] * len(CommandLane)
+        self.coalesced = 0
+        self.failed = 0
+        self.max_wait_ms = 0.0
+        self.max_send_ms = 0.0
+
+    def submit(self, lane: CommandLane, fn: Callable[[], Any], *, inline: bool, key: str | None = None) -> asyncio.Future:
+        """Queue fn(); await the returned future for its result. Must be called on the event loop."""
+        loop = asyncio.get_running_loop()
+        fut: asyncio.Future = loop.create_future()
+        pending = self._keyed.get(key) if key is not None else None
+        if pending is not None:
+            pending.fn = fn
+            pending.inline = inline
+            pending.futures.append(fut)
+            self.coalesced += 1
+            return fut
+        item = _Pending(int(lane), next(self._seq), fn, inline, key, time.monotonic(), [fut])
+        heapq.heappush(self._heap, item)
+        if key is not None:
+            self._keyed[key] = item
+        self._ensure_worker()
+        assert self._wakeup is not None
+        self._wakeup.set()
+        return fut
+
+    def _ensure_worker(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run(), name=f"command-tx-{self.name}")
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+        loop = asyncio.get_running_loop()
+        while True:
+            while not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            item = heapq.heappop(self._heap)
+            if item.key is not None and self._keyed.get(item.key) is item:
+                del self._keyed[item.key]
+            t0 = time.monotonic()
+            self.max_wait_ms = max(self.max_wait_ms, (t0 - item.queued_ts) * 1000.0)
+            try:
+                if item.inline:
+                    result = item.fn()
+                else:
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"command-tx-{self.name}")
+                    result = await loop.run_in_executor(self._executor, item.fn)
+            except Exception as e:
+                self.failed += 1
+                for f in item.futures:
+                    if not f.done():
+                        f.set_exception(e)
+            else:
+                self.sent[item.lane] += 1
+                for f in item.futures:
+                    if not f.done():
+                        f.set_result(result)
+            self.max_send_ms = max(self.max_send_ms, (time.monotonic() - t0) * 1000.0)
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for item in self._heap:
+            for f in item.futures:
+                f.cancel()
+        self._heap.clear()
+        self._keyed.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "queued": len(self._heap),
+            "sent": {lane.name.lower(): self.sent[lane] for lane in CommandLane},
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+            "max_wait_ms": round(self.max_wait_ms, 2),
+            "max_send_ms": round(self.max_send_ms, 2),
+        }
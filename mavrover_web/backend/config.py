@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+# How often get() / watch() stat the file. A stat is the only per-request cost.
+DEFAULT_CHECK_INTERVAL_S = 1.0
+
+ConfigListener = Callable[[dict[str, Any], dict[str, Any]], Awaitable[None]]
+
+
+class ConfigStore:
+    """
+    config.json parsed once and cached, keyed on (mtime_ns, size).
+
+    A reload parses into a new dict and swaps the reference, so readers always see either
+    the old or the new config, never a half-read one. A file that fails to parse (e.g.
+    caught mid-save by an editor) keeps the previous config and is retried on the next
+    change. Returned dicts are shared: treat them as read-only.
+    """
+
+    def __init__(self, path: Path, *, check_interval_s: float = DEFAULT_CHECK_INTERVAL_S) -> None:
+        self.path = path
+        self.check_interval_s = check_interval_s
+        self._cfg: dict[str, Any] = {}
+        self._key: tuple[int, int] | None = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.error: str | None = None
+
+    def _stat_key(self) -> tuple[int, int] | None:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def refresh(self) -> bool:
+        """Re-read the file if it changed on disk. Returns True if the config was replaced."""
+        with self._lock:
+            self._checked = time.monotonic()
+            key = self._stat_key()
+            if key == self._key and self.loads:
+                return False
+            cfg: dict[str, Any] = {}
+            if key is not None:
+                try:
+                    cfg = json.loads(self.path.read_text(encoding="utf-8"))
+                    if not isinstance(cfg, dict):
+                        raise ValueError("top level must be an object")
+                except (OSError, ValueError) as e:
+                    self.error = f"{type(e).__name__}: {e}"
+                    self._key = key
+                    if self.loads:
+                        return False  # keep serving the last good config
+                    cfg = {}
+                else:
+                    self.error = None
+            self._key = key
+            self.loads += 1
+            if cfg == self._cfg:
+                return False
+            self._cfg = cfg
+            return True
+
+    def get(self) -> dict[str, Any]:
+        if not self.loads or time.monotonic() - self._checked >= self.check_interval_s:
+            self.refresh()
+        return self._cfg
+
+    async def watch(self, on_change: ConfigListener) -> None:
+        """Poll the file's mtime and call on_change(old, new) after every reload that changed it."""
+        seen = self.get()
+        while True:
+            await asyncio.sleep(self.check_interval_s)
+            self.refresh()
+            cfg = self._cfg
+            if cfg is seen:
+                continue
+            old, seen = seen, cfg
+            try:
+                await on_change(old, cfg)
+            except Exception as e:
+                # A config that cannot be applied must not kill the watcher.
+                self.error = f"apply: {type(e).__name__}: {e}"
+
+    def stats(self) -> dict[str, Any]:
+        return {"path": str(self.path), "loads": self.loads, "error": self.error}
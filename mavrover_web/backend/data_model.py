@@ -20,6 +20,12 @@ class BatteryModel(BaseModel):
     remaining_pct: float | None = None
 
 
+class AttitudeModel(BaseModel):
+    roll_deg: float | None = None
+    pitch_deg: float | None = None
+    yaw_deg: float | None = None
+
+
 class TelemetryModel(BaseModel):
     connected: bool = False
     last_heartbeat_age_s: float | None = None
@@ -29,6 +35,7 @@ class TelemetryModel(BaseModel):
 
     groundspeed_m_s: float | None = None
     heading_deg: float | None = None
+    attitude: AttitudeModel = Field(default_factory=AttitudeModel)
 
     gps: GPSModel = Field(default_factory=GPSModel)
     battery: BatteryModel = Field(default_factory=BatteryModel)
@@ -58,19 +65,101 @@ class CommandRequest(BaseModel):
     type: Literal["command"] = "command"
     command: CommandType
     params: dict[str, Any] = Field(default_factory=dict)
+    # Target vehicle id/sysid; None => the vehicle the /ws connection is bound to.
+    vehicle: str | None = None
+
+
+TelemetryGroup = Literal[
+    "status",
+    "motion",
+    "attitude",
+    "gps",
+    "battery",
+    "sensors",
+    "statustext",
+]
+
+# Top-level TelemetryModel fields per subscription group.
+# "status" is always sent; timestamp_ms / last_heartbeat_age_s go with every frame.
+TELEMETRY_GROUPS: dict[str, tuple[str, ...]] = {
+    "status": ("connected", "armed", "mode"),
+    "motion": ("groundspeed_m_s", "heading_deg"),
+    "attitude": ("attitude",),
+    "gps": ("gps",),
+    "battery": ("battery",),
+    "sensors": ("sensors_present", "sensors_enabled", "sensors_health"),
+    "statustext": ("errors", "warnings", "statustext"),
+}
+
+
+# Telemetry frame encoding on /ws: JSON text (default) or MessagePack binary messages.
+# Only telemetry / telemetry_delta go binary; server/command events stay JSON text.
+TelemetryEncoding = Literal["json", "msgpack"]
+
+
+class SubscribeRequest(BaseModel):
+    """
+    Per-client telemetry subscription on /ws.
+    groups=None => all groups; rate_hz caps the push rate (frames still go out on change only).
+    """
+
+    type: Literal["subscribe"] = "subscribe"
+    groups: list[TelemetryGroup] | None = None
+    rate_hz: float | None = Field(default=None, gt=0, le=50)
+    min_rate_hz: float | None = Field(default=None, gt=0, le=50)
+    delta: bool | None = None
+    encoding: TelemetryEncoding | None = None
+
+
+class ResyncRequest(BaseModel):
+    """Ask the server to send a full telemetry keyframe next (delta mode)."""
+
+    type: Literal["resync"] = "resync"
+
+
+class RcRequest(BaseModel):
+    """
+    Target for the server-side RC override stream. Resend (even unchanged) faster than
+    rc_timeout_s while driving; release=true hands the channels back to the RC transmitter.
+    """
+
+    type: Literal["rc"] = "rc"
+    steering_pwm: int | None = Field(default=None, ge=1000, le=2000)
+    throttle_pwm: int | None = Field(default=None, ge=1000, le=2000)
+    release: bool = False
+    vehicle: str | None = None
 
 
 class CommandResponse(BaseModel):
     type: Literal["command_result"] = "command_result"
     ok: bool
     message: str | None = None
+    # Set for commands that are confirmed by COMMAND_ACK.
+    command: str | None = None
+    result: str | None = None  # MAV_RESULT name, or NO_ACK
+    attempts: int | None = None
+    latency_ms: float | None = None
+    latency: dict[str, Any] | None = None  # per-command round-trip histogram
 
 
 class TelemetryEvent(BaseModel):
     type: Literal["telemetry"] = "telemetry"
+    version: int = 0
     data: TelemetryModel
 
 
+class TelemetryDeltaEvent(BaseModel):
+    """
+    Only the top-level TelemetryModel fields changed since `base`.
+    timestamp_ms and last_heartbeat_age_s are always included.
+    """
+
+    type: Literal["telemetry_delta"] = "telemetry_delta"
+    version: int
+    base: int
+    data: dict[str, Any] = Field(default_factory=dict)
+
+
 class ServerEvent(BaseModel):
     type: Literal["server"] = "server"
     level: Literal["info", "warning", "error"] = "info"
@@ -79,6 +168,7 @@ class ServerEvent(BaseModel):
 
 class MavOutEvent(BaseModel):
     type: Literal["mav_out"] = "mav_out"
+    vehicle: str | None = None
     name: str
     params: dict[str, Any] = Field(default_factory=dict)
     ts_ms: int
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import io
+import math
+import re
+import struct
+import sys
+import zipfile
+from array import array
+from dataclasses import dataclass
+from itertools import chain
+from typing import Any, BinaryIO, Callable
+
+from .logstore import LogStore
+
+# struct code -> (array typecode, numpy dtype without byte order)
+_NUMERIC = {
+    "b": ("b", "i1"),
+    "B": ("B", "u1"),
+    "h": ("h", "i2"),
+    "H": ("H", "u2"),
+    "i": ("i", "i4"),
+    "I": ("I", "u4"),
+    "q": ("q", "i8"),
+    "Q": ("Q", "u8"),
+    "f": ("f", "f4"),
+    "d": ("d", "f8"),
+}
+_NUMERIC_DESCR = {tc: d for tc, d in _NUMERIC.values()}
+_FORMAT_TOKEN = re.compile(r"(\d*)([a-zA-Z?])")
+_BYTEORDER = "<" if sys.byteorder == "little" else ">"
+
+
+@dataclass
+class Column:
+    """One exported column: native-endian bytes plus the dtype/shape .npy needs to describe it."""
+
+    data: bytes
+    descr: str
+    shape: tuple[int, ...]
+
+
+def _numeric(typecode: str, values: Any, shape: tuple[int, ...] | None = None) -> Column:
+    arr = array(typecode, values)
+    descr = (_BYTEORDER if arr.itemsize > 1 else "|") + _NUMERIC_DESCR[typecode]
+    return Column(arr.tobytes(), descr, shape or (len(arr),))
+
+
+def _bool(values: Any) -> Column:
+    data = bytes(1 if v else 0 for v in values)
+    return Column(data, "|b1", (len(data),))
+
+
+# --- derived columns: the values handle_mavlink_message puts into the snapshot ---
+
+NAN = float("nan")
+_INT32_NODATA = (0, 2147483647, -2147483648)
+
+
+def _scaled(col: list[Any], scale: float, invalid: Callable[[Any], bool]) -> Column:
+    return _numeric("d", [NAN if invalid(v) else v / scale for v in col])
+
+
+def _derive_gps(c: dict[str, list[Any]]) -> dict[str, Column]:
+    return {
+        "gps.lat": _scaled(c["lat"], 1e7, lambda v: v in _INT32_NODATA),
+        "gps.lon": _scaled(c["lon"], 1e7, lambda v: v in _INT32_NODATA),
+        "gps.alt_m": _scaled(c["alt"], 1000.0, lambda v: v == 0),
+        "gps.hdop": _scaled(c["eph"], 100.0, lambda v: v <= 0),
+    }
+
+
+def _derive_sys_status(c: dict[str, list[Any]]) -> dict[str, Column]:
+    return {
+        "battery.voltage_v": _scaled(c["voltage_battery"], 1000.0, lambda v: v == 0),
+        "battery.current_a": _scaled(c["current_battery"], 100.0, lambda v: v in (-1, 0)),
+        "battery.remaining_pct": _scaled(c["battery_remaining"], 1.0, lambda v: v < 0),
+    }
+
+
+def _derive_attitude(c: dict[str, list[Any]]) -> dict[str, Column]:
+    return {
+        f"attitude.{name}_deg": _numeric("d", [round(math.degrees(v), 2) for v in c[name]])
+        for name in ("roll", "pitch", "yaw")
+    }
+
+
+def _derive_vfr_hud(c: dict[str, list[Any]]) -> dict[str, Column]:
+    return {
+        "groundspeed_m_s": _numeric("d", c["groundspeed"]),
+        "heading_deg": _numeric("d", c["heading"]),
+    }
+
+
+def _derive_heartbeat(c: dict[str, list[Any]]) -> dict[str, Column]:
+    # MAV_MODE_FLAG_SAFETY_ARMED = 128
+    return {"armed": _bool(v & 128 for v in c["base_mode"])}
+
+
+DERIVED: dict[str, Callable[[dict[str, list[Any]]], dict[str, Column]]] = {
+    "GPS_RAW_INT": _derive_gps,
+    "SYS_STATUS": _derive_sys_status,
+    "ATTITUDE": _derive_attitude,
+    "VFR_HUD": _derive_vfr_hud,
+    "HEARTBEAT": _derive_heartbeat,
+}
+
+
+# --- batch decoding ---
+
+
+def _layout(cls: Any) -> list[tuple[str, str, int]]:
+    """(field, struct code, count) per wire-ordered field of a pymavlink message class."""
+    fmt = cls.unpacker.format
+    if isinstance(fmt, bytes):
+        fmt = fmt.decode("ascii")
+    tokens = [(int(n) if n else 1, code) for n, code in _FORMAT_TOKEN.findall(fmt.lstrip("<>=!@"))]
+    return [(name, code, n) for name, (n, code) in zip(cls.ordered_fieldnames, tokens)]
+
+
+def _payload(record: bytes) -> bytes:
+    header = 10 if record[8] == 0xFD else 6
+    plen = record[9]
+    return record[8 + header : 8 + header + plen]
+
+
+def decode_columns(
+    store: LogStore,
+    log_id: str,
+    types: list[str] | None = None,
+    t_from: float | None = None,
+    t_to: float | None = None,
+) -> dict[str, dict[str, Column]]:
+    """
+    Decode a recorded log into one column table per message type.
+
+    Records of a type are pulled through the sidecar index, their payloads zero-padded
+    to the full wire size (MAVLink 2 trims trailing zeros) and concatenated, then decoded
+    in one struct.iter_unpack pass and transposed into columns.
+    """
+    from pymavlink.dialects.v20 import ardupilotmega as mavlink2
+
+    idx = store.index(log_id)
+    if types:
+        msgids = [i for i in (store.msgid(t) for t in types) if i is not None]
+    else:
+        msgids = sorted(idx.types)
+
+    tables: dict[str, dict[str, Column]] = {}
+    for msgid in msgids:
+        cls = mavlink2.mavlink_map.get(msgid)
+        if cls is None or msgid not in idx.types:
+            continue
+        unpacker = cls.unpacker
+        size = unpacker.size
+        ts: list[float] = []
+        payloads: list[bytes] = []
+        for ts_us, record in store.read_range(log_id, t_from, t_to, [cls.msgname]):
+            p = _payload(record)
+            if len(p) != size:
+                p = p[:size].ljust(size, b"\0")
+            ts.append(ts_us / 1e6)
+            payloads.append(p)
+        if not payloads:
+            continue
+
+        rows = list(unpacker.iter_unpack(b"".join(payloads)))
+        flat = list(zip(*rows))
+        table: dict[str, Column] = {"t": _numeric("d", ts)}
+        raw: dict[str, list[Any]] = {}
+        pos = 0
+        for name, code, count in _layout(cls):
+            if code == "s" or code == "c":
+                # char[N]: fixed-width byte strings, NUL padded
+                table[name] = Column(b"".join(flat[pos]), f"|S{count if code == 's' else 1}", (len(rows),))
+                pos += 1
+                continue
+            tc = _NUMERIC[code][0]
+            if count == 1:
+                raw[name] = list(flat[pos])
+                table[name] = _numeric(tc, flat[pos])
+            else:
+                values = chain.from_iterable(row[pos : pos + count] for row in rows)
+                table[name] = _numeric(tc, values, (len(rows), count))
+            pos += count
+        derive = DERIVED.get(cls.msgname)
+        if derive is not None:
+            table.update(derive(raw))
+        tables[cls.msgname] = table
+    return tables
+
+
+# --- .npz writer (numpy is not a dependency; the output loads with numpy.load) ---
+
+
+def _npy_header(col: Column) -> bytes:
+    header = repr({"descr": col.descr, "fortran_order": False, "shape": col.shape})
+    # magic(6) + version(2) + header length(2) + header, padded to a multiple of 64
+    pad = 64 - (10 + len(header) + 1) % 64
+    body = (header + " " * (pad % 64) + "\n").encode("latin1")
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(body)) + body
+
+
+def write_npz(tables: dict[str, dict[str, Column]], out: BinaryIO, *, compress: bool = True) -> None:
+    """Members are named "<MSG_TYPE>/<field>.npy", i.e. np.load(f)["GPS_RAW_INT/gps.lat"]."""
+    mode = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    with zipfile.ZipFile(out, "w", compression=mode, allowZip64=True) as zf:
+        for msgtype, table in tables.items():
+            for name, col in table.items():
+                zf.writestr(f"{msgtype}/{name}.npy", _npy_header(col) + col.data)
+
+
+def export_npz(
+    store: LogStore,
+    log_id: str,
+    types: list[str] | None = None,
+    t_from: float | None = None,
+    t_to: float | None = None,
+    *,
+    compress: bool = True,
+) -> bytes:
+    buf = io.BytesIO()
+    write_npz(decode_columns(store, log_id, types, t_from, t_to), buf, compress=compress)
+    return buf.getvalue()
+
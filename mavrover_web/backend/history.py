@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any
+
+# 30 min at 20 Hz per series (~16 bytes per sample: float64 timestamp + float64 value).
+DEFAULT_CAPACITY = 36_000
+
+
+class _Ring:
+    """Fixed-size, preallocated (timestamp, value) ring for one series."""
+
+    __slots__ = ("ts", "values", "head", "count")
+
+    def __init__(self, capacity: int) -> None:
+        self.ts = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+        self.head = 0  # next write position
+        self.count = 0
+
+    def append(self, ts: float, value: float) -> None:
+        i = self.head
+        self.ts[i] = ts
+        self.values[i] = value
+        i += 1
+        self.head = 0 if i == len(self.ts) else i
+        if self.count < len(self.ts):
+            self.count += 1
+
+    def ordered(self) -> tuple[array, array]:
+        """Copy of the series in time order (oldest first)."""
+        n, h = self.count, self.head
+        if n < len(self.ts):
+            return self.ts[:n], self.values[:n]
+        return self.ts[h:] + self.ts[:h], self.values[h:] + self.values[:h]
+
+
+class TelemetryHistory:
+    """
+    Backend-side telemetry history: one preallocated ring per numeric series
+    ("groundspeed_m_s", "gps.lat", "battery.voltage_v", ...), fed by the RX thread
+    with every decoded sample. Queried by /api/history.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        self.capacity = max(16, int(capacity))
+        self._rings: dict[str, _Ring] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, value: Any, ts: float | None = None) -> None:
+        if value is None or isinstance(value, bool) or not isinstance(value, (int, float)):
+            return
+        if ts is None:
+            ts = time.time()
+        with self._lock:
+            ring = self._rings.get(name)
+            if ring is None:
+                ring = self._rings[name] = _Ring(self.capacity)
+            ring.append(ts, float(value))
+
+    def record_group(self, group: str, values: dict[str, Any], ts: float | None = None) -> None:
+        """Record the fields of a nested group as "group.field" series under one lock."""
+        if ts is None:
+            ts = time.time()
+        with self._lock:
+            for k, value in values.items():
+                if value is None or isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{group}.{k}"
+                ring = self._rings.get(name)
+                if ring is None:
+                    ring = self._rings[name] = _Ring(self.capacity)
+                ring.append(ts, float(value))
+
+    def fields(self) -> list[str]:
+        with self._lock:
+            return sorted(self._rings)
+
+    def query(
+        self,
+        fields: list[str] | None = None,
+        t_from: float | None = None,
+        t_to: float | None = None,
+        max_points: int = 1000,
+    ) -> dict[str, dict[str, list[float]]]:
+        """
+        Samples with t_from <= ts <= t_to per series. Series longer than max_points are
+        downsampled by striding (the newest sample is always kept).
+        """
+        max_points = max(2, int(max_points))
+        with self._lock:
+            names = list(self._rings) if not fields else [f for f in fields if f in self._rings]
+            copies = {name: self._rings[name].ordered() for name in names}
+
+        out: dict[str, dict[str, list[float]]] = {}
+        for name, (ts, values) in copies.items():
+            lo = 0 if t_from is None else bisect_left(ts, t_from)
+            hi = len(ts) if t_to is None else bisect_right(ts, t_to)
+            n = hi - lo
+            if n <= 0:
+                out[name] = {"t": [], "v": []}
+                continue
+            step = max(1, math.ceil(n / max_points))
+            idx = list(range(lo, hi, step))
+            if idx[-1] != hi - 1:
+                idx[-1] = hi - 1
+            out[name] = {"t": [ts[i] for i in idx], "v": [values[i] for i in idx]}
+        return out
@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import json
+import math
+import mmap
+import re
+import struct
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Any, Iterator
+
+# Sparse time index granularity: one (timestamp, offset) entry per second of log.
+TIME_INDEX_STEP_US = 1_000_000
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".idx"
+
+LOG_ID_RE = re.compile(r"^[\w.\-]+\.tlog$")
+
+_TS = struct.Struct(">Q")
+
+
+def frame_info(buf: bytes | bytearray | mmap.mmap, pos: int = 0) -> tuple[int, int] | None:
+    """
+    (frame_length, msgid) of the raw MAVLink frame starting at buf[pos], or None if
+    there is no valid v1/v2 header there. Only the header is looked at.
+    """
+    n = len(buf)
+    if pos + 3 > n:
+        return None
+    magic = buf[pos]
+    if magic == 0xFD:
+        if pos + 10 > n:
+            return None
+        plen = buf[pos + 1]
+        signed = buf[pos + 2] & 0x01
+        msgid = buf[pos + 7] | (buf[pos + 8] << 8) | (buf[pos + 9] << 16)
+        return 10 + plen + 2 + (13 if signed else 0), msgid
+    if magic == 0xFE:
+        if pos + 6 > n:
+            return None
+        return 6 + buf[pos + 1] + 2, buf[pos + 5]
+    return None
+
+
+def iter_records(mm: mmap.mmap | bytes, start: int = 0, end: int | None = None) -> Iterator[tuple[int, int, int, int]]:
+    """
+    Walk tlog records: yields (offset, ts_us, msgid, record_length).
+    Garbage between records is skipped byte by byte until a plausible header shows up.
+    Stops at the last complete record before `end`.
+    """
+    end = len(mm) if end is None else end
+    pos = start
+    while pos + 8 < end:
+        info = frame_info(mm, pos + 8)
+        if info is None:
+            pos += 1
+            continue
+        flen, msgid = info
+        rlen = 8 + flen
+        if pos + rlen > end:
+            return
+        yield pos, _TS.unpack_from(mm, pos)[0], msgid, rlen
+        pos += rlen
+
+
+class TlogIndex:
+    """
+    Sidecar index of one tlog: a sparse time -> byte offset table and, per MAVLink
+    message id, the offsets of all its records. Built incrementally (by the recorder
+    while writing, or by scanning the file on first open) and stored next to the log
+    as <name>.tlog.idx: one JSON header line followed by little-endian int64 offsets.
+    """
+
+    def __init__(self) -> None:
+        self.size = 0  # bytes covered (end of the last complete record)
+        self.mtime_ns = 0
+        self.count = 0
+        self.first_us: int | None = None
+        self.last_us: int | None = None
+        self.time_ts: array = array("q")
+        self.time_off: array = array("q")
+        self.types: dict[int, array] = {}
+
+    def add(self, offset: int, ts_us: int, msgid: int, rlen: int) -> None:
+        if self.first_us is None:
+            self.first_us = ts_us
+        if not self.time_ts or ts_us >= self.time_ts[-1] + TIME_INDEX_STEP_US:
+            self.time_ts.append(ts_us)
+            self.time_off.append(offset)
+        if self.last_us is None or ts_us > self.last_us:
+            self.last_us = ts_us
+        offs = self.types.get(msgid)
+        if offs is None:
+            offs = self.types[msgid] = array("q")
+        offs.append(offset)
+        self.count += 1
+        self.size = offset + rlen
+
+    def extend(self, mm: mmap.mmap | bytes) -> None:
+        for offset, ts_us, msgid, rlen in iter_records(mm, self.size):
+            self.add(offset, ts_us, msgid, rlen)
+
+    def start_offset(self, ts_us: int) -> int:
+        """Offset of a record at or before ts_us to start scanning from."""
+        i = bisect_right(self.time_ts, ts_us) - 1
+        return self.time_off[i] if i >= 0 else 0
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "messages": self.count,
+            "start": None if self.first_us is None else self.first_us / 1e6,
+            "end": None if self.last_us is None else self.last_us / 1e6,
+        }
+
+    # --- sidecar file ---
+
+    def save(self, path: Path) -> None:
+        ids = sorted(self.types)
+        blob = array("q")
+        spans: dict[str, list[int]] = {}
+        for msgid in ids:
+            spans[str(msgid)] = [len(blob), len(self.types[msgid])]
+            blob.extend(self.types[msgid])
+        header = {
+            "version": INDEX_VERSION,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "count": self.count,
+            "first_us": self.first_us,
+            "last_us": self.last_us,
+            "time_index": [list(self.time_ts), list(self.time_off)],
+            "types": spans,
+        }
+        if struct.pack("=q", 1) != struct.pack("<q", 1):
+            blob.byteswap()
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(json.dumps(header, separators=(",", ":")).encode("ascii") + b"\n")
+            f.write(blob.tobytes())
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> TlogIndex | None:
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.readline())
+                raw = f.read()
+        except (OSError, ValueError):
+            return None
+        if header.get("version") != INDEX_VERSION:
+            return None
+        blob = array("q")
+        blob.frombytes(raw[: len(raw) - len(raw) % 8])
+        if struct.pack("=q", 1) != struct.pack("<q", 1):
+            blob.byteswap()
+        idx = cls()
+        idx.size = int(header["size"])
+        idx.mtime_ns = int(header["mtime_ns"])
+        idx.count = int(header["count"])
+        idx.first_us = header["first_us"]
+        idx.last_us = header["last_us"]
+        idx.time_ts = array("q", header["time_index"][0])
+        idx.time_off = array("q", header["time_index"][1])
+        for msgid, (start, n) in header["types"].items():
+            idx.types[int(msgid)] = blob[start : start + n]
+        return idx
+
+
+def _msg_names() -> dict[str, int]:
+    from pymavlink.dialects.v20 import ardupilotmega as mavlink2
+
+    return {cls.msgname: msgid for msgid, cls in mavlink2.mavlink_map.items()}
+
+
+class LogStore:
+    """
+    The tlog directory (logs/): lists recordings and serves time windows out of them.
+    Indexes are cached in memory, persisted as sidecars and extended incrementally
+    when a log grows (the file currently being recorded).
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self._indexes: dict[str, TlogIndex] = {}
+        self._lock = threading.Lock()
+        self._names: dict[str, int] | None = None
+
+    def path_for(self, log_id: str) -> Path:
+        if not LOG_ID_RE.match(log_id):
+            raise FileNotFoundError(log_id)
+        path = self.directory / log_id
+        if not path.is_file():
+            raise FileNotFoundError(log_id)
+        return path
+
+    def msgid(self, name: str) -> int | None:
+        if self._names is None:
+            self._names = _msg_names()
+        return self._names.get(name.strip().upper())
+
+    def list(self) -> list[dict[str, Any]]:
+        if not self.directory.is_dir():
+            return []
+        out = []
+        for path in sorted(self.directory.glob("*.tlog")):
+            st = path.stat()
+            idx = self._indexes.get(path.name)
+            item: dict[str, Any] = {"id": path.name, "size": st.st_size, "indexed": idx is not None}
+            if idx is not None:
+                item.update(idx.summary())
+            out.append(item)
+        return out
+
+    def index(self, log_id: str) -> TlogIndex:
+        path = self.path_for(log_id)
+        with self._lock:
+            st = path.stat()
+            idx = self._indexes.get(log_id)
+            sidecar = path.with_name(path.name + INDEX_SUFFIX)
+            if idx is None:
+                idx = TlogIndex.load(sidecar)
+                # A sidecar for a different (rewritten) file is useless.
+                if idx is not None and (idx.size > st.st_size or idx.mtime_ns > st.st_mtime_ns):
+                    idx = None
+            if idx is None:
+                idx = TlogIndex()
+            if idx.size < st.st_size and idx.mtime_ns != st.st_mtime_ns:
+                with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    idx.extend(mm)
+                idx.mtime_ns = st.st_mtime_ns
+                try:
+                    idx.save(sidecar)
+                except OSError:
+                    pass
+            self._indexes[log_id] = idx
+            return idx
+
+    def read_range(
+        self,
+        log_id: str,
+        t_from: float | None = None,
+        t_to: float | None = None,
+        types: list[str] | None = None,
+        limit: int | None = None,
+    ) -> Iterator[tuple[int, bytes]]:
+        """
+        Yields (ts_us, raw tlog record) for t_from <= ts <= t_to, optionally only for the
+        given message types. Only the requested window of the memory-mapped file is touched.
+        Stops after `limit` records.
+        """
+        idx = self.index(log_id)
+        path = self.path_for(log_id)
+        lo_us = None if t_from is None else int(t_from * 1e6)
+        hi_us = None if t_to is None else int(t_to * 1e6)
+
+        if path.stat().st_size == 0:
+            return  # just created by the recorder; mmap refuses empty files
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            n = 0
+            if types:
+                ids = [i for i in (self.msgid(t) for t in types) if i is not None]
+
+                def ts_at(off: int) -> int:
+                    return _TS.unpack_from(mm, off)[0]
+
+                offsets: list[int] = []
+                for msgid in ids:
+                    offs = idx.types.get(msgid)
+                    if not offs:
+                        continue
+                    a = 0 if lo_us is None else bisect_left(offs, lo_us, key=ts_at)
+                    b = len(offs) if hi_us is None else bisect_right(offs, hi_us, key=ts_at)
+                    offsets.extend(offs[a:b])
+                offsets.sort()
+                for off in offsets:
+                    info = frame_info(mm, off + 8)
+                    if info is None:
+                        continue
+                    yield ts_at(off), mm[off : off + 8 + info[0]]
+                    n += 1
+                    if limit is not None and n >= limit:
+                        return
+                return
+
+            start = 0 if lo_us is None else idx.start_offset(lo_us)
+            for off, ts_us, _msgid, rlen in iter_records(mm, start, idx.size):
+                if lo_us is not None and ts_us < lo_us:
+                    continue
+                if hi_us is not None and ts_us > hi_us:
+                    return
+                yield ts_us, mm[off : off + rlen]
+                n += 1
+                if limit is not None and n >= limit:
+                    return
+
+
+_decoder: Any = None
+
+
+def decode_record(record: bytes) -> dict[str, Any] | None:
+    """JSON-ready dict of one tlog record (timestamp + decoded fields), None if undecodable."""
+    global _decoder
+    if _decoder is None:
+        from pymavlink.dialects.v20 import ardupilotmega as mavlink2
+
+        _decoder = mavlink2.MAVLink(None)
+        _decoder.robust_parsing = True
+    try:
+        msg = _decoder.decode(bytearray(record[8:]))
+    except Exception:
+        return None
+    out: dict[str, Any] = {"t": _TS.unpack_from(record)[0] / 1e6}
+    for k, v in msg.to_dict().items():
+        if isinstance(v, float) and not math.isfinite(v):
+            v = None
+        elif isinstance(v, (bytes, bytearray)):
+            v = v.hex()
+        out[k] = v
+    return out
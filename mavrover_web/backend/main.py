@@ -1,20 +1,47 @@
 from __future__ import annotations
 
+import asyncio
+import functools
 import json
-import threading
 import time
-import urllib.request
 from pathlib import Path
-from typing import Any
+from typing import Any, Awaitable, Callable
 
 import anyio
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
-from .data_model import CommandRequest, CommandResponse, MavOutEvent, ServerEvent, TelemetryEvent
-from .mavlink import MavlinkClient, MavlinkConfig, MavlinkError
-from .telemetry import TelemetryState, handle_mavlink_message
+from .acks import DEFAULT_ACK_TIMEOUT_S, DEFAULT_RETRIES, AckResult
+from .broadcast import DEFAULT_MAX_RATE_HZ, DEFAULT_MIN_RATE_HZ, TelemetrySubscription
+from .commands import CommandLane, coalesce_key, command_lane
+from .config import ConfigStore
+from .data_model import (
+    CommandRequest,
+    CommandResponse,
+    MavOutEvent,
+    RcRequest,
+    ResyncRequest,
+    ServerEvent,
+    SubscribeRequest,
+    TelemetryEvent,
+)
+from .export import export_npz
+from .history import DEFAULT_CAPACITY as DEFAULT_HISTORY_CAPACITY
+from .logstore import LogStore, decode_record
+from .mavlink import MavlinkClient, MavlinkError
+from .vehicles import Vehicle, VehicleRegistry
+from .video import (
+    DEFAULT_PROBE_INTERVAL_S,
+    DEFAULT_VIDEO_DUTY,
+    DEFAULT_VIDEO_MIN_FPS,
+    RELAY_BOUNDARY,
+    JpegScaler,
+    LinkMonitor,
+    MjpegRelay,
+    VideoProber,
+    ViewerPacer,
+)
 
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
@@ -23,76 +50,27 @@ CONFIG_PATH = ROOT_DIR / "config.json"
 
 
 def load_config() -> dict[str, Any]:
-    if not CONFIG_PATH.exists():
-        return {}
-    return json.loads(CONFIG_PATH.read_text(encoding="utf-8"))
+    # Cached; re-read only when config.json's mtime/size changes.
+    return shared.config.get()
 
 
 class SharedState:
     def __init__(self) -> None:
-        self.telemetry = TelemetryState()
-        self.lock = threading.Lock()
-        self.mav: MavlinkClient | None = None
-        self.thread: threading.Thread | None = None
-        self.stop_event = threading.Event()
+        self.config = ConfigStore(CONFIG_PATH)
+        self.config_task: asyncio.Task | None = None
         self.cfg: dict[str, Any] = {}
+        # Per-vehicle RX thread, telemetry, broadcaster, history and recorder live in Vehicle.
+        self.vehicles = VehicleRegistry()
+        self.logs: LogStore | None = None
+        self.video_relay = MjpegRelay(lambda: self.cfg.get("video_url", ""))
+        self.video_probe = VideoProber(lambda: self.cfg.get("video_url", ""), relay=self.video_relay)
+        self.video_scaler = JpegScaler(enabled=False)
+        self.links = LinkMonitor()
 
 
 shared = SharedState()
 
 
-def mavlink_rx_loop() -> None:
-    backoff_s = 1.0
-    while not shared.stop_event.is_set():
-        cfg = shared.cfg
-        port = str(cfg.get("serial_port") or "").strip()
-        baudrate = int(cfg.get("baudrate") or 115200)
-        if not port:
-            time.sleep(0.5)
-            continue
-
-        client = MavlinkClient(MavlinkConfig(serial_port=port, baudrate=baudrate))
-        try:
-            client.connect()
-            with shared.lock:
-                shared.mav = client
-                shared.telemetry.data.connected = True
-            backoff_s = 1.0
-
-            while not shared.stop_event.is_set():
-                msg = client.recv_match(timeout_s=1.0)
-                if msg is None:
-                    # no message; keep loop alive
-                    continue
-                with shared.lock:
-                    handle_mavlink_message(shared.telemetry, msg)
-                    if getattr(msg, "get_type", lambda: None)() == "HEARTBEAT":
-                        mode_str = client.mode_string_from_heartbeat(msg)
-                        if mode_str:
-                            shared.telemetry.data.mode = mode_str
-        except Exception as e:
-            with shared.lock:
-                shared.telemetry.data.connected = False
-                shared.telemetry.data.armed = None
-            # Best-effort close
-            try:
-                client.close()
-            except Exception:
-                pass
-            with shared.lock:
-                if shared.mav is client:
-                    shared.mav = None
-
-            # Backoff before reconnect
-            time.sleep(min(10.0, backoff_s))
-            backoff_s = min(10.0, backoff_s * 1.8)
-            # Keep a small trace in warnings
-            with shared.lock:
-                shared.telemetry.data.warnings.append(f"MAVLink reconnect: {type(e).__name__}: {e}")
-                if len(shared.telemetry.data.warnings) > 30:
-                    shared.telemetry.data.warnings = shared.telemetry.data.warnings[-30:]
-
-
 app = FastAPI(title="MavRover Web")
 
 # Не падаем при импорте, если фронтенд- папка отсутствует (частая причина "Could not import module").
@@ -101,25 +79,52 @@ app.mount("/static", StaticFiles(directory=str(FRONTEND_DIR), check_dir=False),
 
 
 @app.on_event("startup")
-def _startup() -> None:
+async def _startup() -> None:
     shared.cfg = load_config()
-    shared.stop_event.clear()
-    t = threading.Thread(target=mavlink_rx_loop, name="mavlink-rx", daemon=True)
-    shared.thread = t
-    t.start()
+    tlog_dir = Path(str(shared.cfg.get("tlog_dir") or "logs"))
+    if not tlog_dir.is_absolute():
+        tlog_dir = ROOT_DIR / tlog_dir
+    shared.logs = LogStore(tlog_dir)
+    shared.vehicles.configure(shared.cfg)
+    shared.vehicles.start(
+        history_capacity=int(shared.cfg.get("history_capacity") or DEFAULT_HISTORY_CAPACITY),
+        tlog_dir=tlog_dir if shared.cfg.get("tlog_enabled") else None,
+        tlog_max_bytes=int(shared.cfg.get("tlog_max_mb") or 64) * 1024 * 1024,
+        # Per vehicle: older files are deleted on rotation beyond this total.
+        tlog_max_total_bytes=int(shared.cfg.get("tlog_max_total_mb") or 1024) * 1024 * 1024,
+        rc_rate_hz=shared.cfg.get("rc_rate_hz"),
+        rc_timeout_s=shared.cfg.get("rc_timeout_s"),
+    )
+    shared.video_probe.interval_s = float(shared.cfg.get("video_probe_interval_s") or DEFAULT_PROBE_INTERVAL_S)
+    shared.video_probe.start()
+    shared.video_scaler = JpegScaler(enabled=bool(shared.cfg.get("video_reencode", True)))
+    shared.config_task = asyncio.get_running_loop().create_task(shared.config.watch(_config_changed))
+
+
+async def _config_changed(old: dict[str, Any], new: dict[str, Any]) -> None:
+    # config.json edited while running: apply what can be applied live.
+    shared.cfg = new
+    for v in shared.vehicles:
+        v.rc.configure(rate_hz=new.get("rc_rate_hz"), timeout_s=new.get("rc_timeout_s"))
+    await shared.vehicles.reconfigure(new)
 
 
 @app.on_event("shutdown")
-def _shutdown() -> None:
-    shared.stop_event.set()
-    with shared.lock:
-        mav = shared.mav
-        shared.mav = None
-    if mav is not None:
-        try:
-            mav.close()
-        except Exception:
-            pass
+async def _shutdown() -> None:
+    if shared.config_task is not None:
+        shared.config_task.cancel()
+        shared.config_task = None
+    shared.video_probe.stop()
+    shared.video_relay.stop()
+    shared.video_scaler.stop()
+    shared.vehicles.stop()
+
+
+def _vehicle(key: str | None) -> Vehicle:
+    v = shared.vehicles.get(key)
+    if v is None:
+        raise HTTPException(status_code=404, detail=f"Unknown vehicle: {key}")
+    return v
 
 
 @app.get("/")
@@ -134,62 +139,235 @@ def api_config() -> JSONResponse:
     return JSONResponse(
         {
             "video_url": cfg.get("video_url", ""),
+            # Browsers watch the backend relay (/video/stream) unless disabled.
+            "video_relay": bool(cfg.get("video_relay", True)),
         }
     )
 
 
-def _check_video_url(video_url: str, timeout_s: float = 2.0) -> dict[str, Any]:
-    video_url = (video_url or "").strip()
-    if not video_url:
-        return {"configured": False, "ok": False, "error": "video_url is empty"}
+@app.get("/video/stream")
+async def video_stream(request: Request, adaptive: bool = True) -> StreamingResponse:
+    cfg = shared.cfg
+    if not str(cfg.get("video_url") or "").strip():
+        raise HTTPException(status_code=404, detail="video_url is empty")
+    pacer = None
+    if adaptive and cfg.get("video_adaptive", True):
+        # Skip/downscale frames for this viewer from its own send backlog, and back off
+        # further when its telemetry WebSocket is backing up.
+        host = request.client.host if request.client else ""
+        max_fps = cfg.get("video_max_fps")
+        pacer = ViewerPacer(
+            duty=float(cfg.get("video_duty") or DEFAULT_VIDEO_DUTY),
+            min_fps=float(cfg.get("video_min_fps") or DEFAULT_VIDEO_MIN_FPS),
+            max_fps=float(max_fps) if max_fps else None,
+            max_level=shared.video_scaler.max_level,
+            congested=lambda: shared.links.congested(host),
+        )
+    return StreamingResponse(
+        shared.video_relay.stream(pacer, shared.video_scaler),
+        media_type=f"multipart/x-mixed-replace; boundary={RELAY_BOUNDARY}",
+        headers={"Cache-Control": "no-store"},
+    )
+
+
+@app.get("/api/video/snapshot")
+async def api_video_snapshot(request: Request) -> Response:
+    # Served from the relay's latest frame; pollers revalidate with If-None-Match and get a
+    # 304 until a new frame arrives, instead of opening the MJPEG stream each time.
+    cfg = shared.cfg
+    if not str(cfg.get("video_url") or "").strip():
+        raise HTTPException(status_code=404, detail="video_url is empty")
+    frame = await shared.video_relay.snapshot(
+        max_age_s=float(cfg.get("snapshot_max_age_s") or 2.0),
+        timeout_s=float(cfg.get("snapshot_timeout_s") or 5.0),
+    )
+    if frame is None:
+        detail = shared.video_relay.error or "no frame from camera"
+        raise HTTPException(status_code=503, detail=f"Video unavailable: {detail}")
+    etag = f'"{shared.video_relay.epoch}-{frame.seq}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "X-Frame-Age-Ms": str(int((time.monotonic() - frame.ts) * 1000)),
+    }
+    if etag in _etags(request.headers.get("if-none-match", "")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=frame.data, media_type="image/jpeg", headers=headers)
+
+
+def _etags(header: str) -> set[str]:
+    return {t.strip().removeprefix("W/") for t in header.split(",") if t.strip()}
+
+
+@app.get("/api/vehicles")
+def api_vehicles() -> JSONResponse:
+    return JSONResponse({"default": shared.vehicles.default_id, "vehicles": [v.info() for v in shared.vehicles]})
+
+
+@app.get("/api/telemetry")
+def api_telemetry(vehicle: str = "") -> JSONResponse:
+    # Schema-validated export: the only place (besides tests/tools) a TelemetryModel is built.
+    snap = _vehicle(vehicle).telemetry.snapshot
+    return JSONResponse(TelemetryEvent(version=snap.version, data=snap.to_model()).model_dump())
+
+
+@app.get("/api/history")
+def api_history(
+    fields: str = "",
+    from_: float | None = Query(default=None, alias="from"),
+    to: float | None = None,
+    max_points: int = Query(default=1000, ge=2, le=20000),
+    vehicle: str = "",
+) -> JSONResponse:
+    """
+    Recorded telemetry series, e.g.
+    /api/history?fields=gps.lat,gps.lon&from=<unix s>&to=<unix s>&max_points=2000
+    Default window: the whole buffer. Sync endpoint => runs in the threadpool.
+    """
+    history = _vehicle(vehicle).telemetry.history
+    if history is None:
+        return JSONResponse({"fields": {}, "available": []})
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    return JSONResponse(
+        {
+            "fields": history.query(names or None, t_from=from_, t_to=to, max_points=max_points),
+            "available": history.fields(),
+        }
+    )
+
+
+@app.get("/api/logs")
+def api_logs() -> JSONResponse:
+    store = shared.logs
+    return JSONResponse({"logs": [] if store is None else store.list()})
+
+
+@app.get("/api/logs/{log_id}/range")
+def api_log_range(
+    log_id: str,
+    from_: float | None = Query(default=None, alias="from"),
+    to: float | None = None,
+    types: str = "",
+    format: str = Query(default="json", pattern="^(json|tlog)$"),
+    limit: int = Query(default=5000, ge=1, le=200_000),
+):
+    """
+    A time window of a recorded tlog, e.g.
+    /api/logs/<id>/range?from=<unix s>&to=<unix s>&types=GPS_RAW_INT,ATTITUDE
+    format=json decodes up to `limit` messages; format=tlog streams the raw records
+    (a valid tlog, openable by Mission Planner / MAVExplorer) without a limit.
+    """
+    store = shared.logs
+    if store is None:
+        raise HTTPException(status_code=404, detail="Log store is not initialised")
     try:
-        req = urllib.request.Request(
-            video_url,
-            headers={
-                "User-Agent": "mavrover_web/1.0",
-                "Accept": "*/*",
-            },
-            method="GET",
+        store.index(log_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown log: {log_id}") from None
+    names = [t for t in types.split(",") if t.strip()] or None
+
+    if format == "tlog":
+        def chunks():
+            buf: list[bytes] = []
+            for _ts, rec in store.read_range(log_id, from_, to, names):
+                buf.append(rec)
+                if len(buf) >= 4096:
+                    yield b"".join(buf)
+                    buf.clear()
+            if buf:
+                yield b"".join(buf)
+
+        return StreamingResponse(
+            chunks(),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="range_{log_id}"'},
         )
-        with urllib.request.urlopen(req, timeout=timeout_s) as resp:
-            # MJPEG stream is infinite; just read a small chunk and close.
-            _ = resp.read(256)
-            ctype = resp.headers.get("Content-Type", "")
-        return {"configured": True, "ok": True, "content_type": ctype}
-    except Exception as e:
-        return {"configured": True, "ok": False, "error": f"{type(e).__name__}: {e}"}
 
+    # One record past the limit tells whether the window really holds more.
+    messages = []
+    records = 0
+    truncated = False
+    for _ts, rec in store.read_range(log_id, from_, to, names, limit=limit + 1):
+        records += 1
+        if records > limit:
+            truncated = True
+            break
+        m = decode_record(rec)
+        if m is not None:
+            messages.append(m)
+    return JSONResponse({"log": log_id, "count": len(messages), "truncated": truncated, "messages": messages})
+
+
+@app.get("/api/logs/{log_id}/export.npz")
+def api_log_export(
+    log_id: str,
+    from_: float | None = Query(default=None, alias="from"),
+    to: float | None = None,
+    types: str = "",
+) -> Response:
+    """
+    Columnar export: one table per message type (raw fields + the decoded telemetry
+    fields), as a NumPy .npz with members "<TYPE>/<field>". See tools/export_tlog.py.
+    """
+    store = shared.logs
+    if store is None:
+        raise HTTPException(status_code=404, detail="Log store is not initialised")
+    names = [t for t in types.split(",") if t.strip()] or None
+    try:
+        data = export_npz(store, log_id, names, from_, to)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown log: {log_id}") from None
+    return Response(
+        data,
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{Path(log_id).stem}.npz"'},
+    )
 
-@app.get("/api/check")
-async def api_check() -> JSONResponse:
-    cfg = load_config()
-    video_url = str(cfg.get("video_url", "") or "")
 
-    with shared.lock:
-        tel = shared.telemetry.to_model()
-        mav = shared.mav
+@app.get("/api/check")
+async def api_check(vehicle: str = "") -> JSONResponse:
+    v = _vehicle(vehicle)
+    snap = v.telemetry.snapshot
+    tel = snap.data
+    mav = v.mav
 
     mav_ping: dict[str, Any] = {"ok": False, "error": "not connected"}
     if mav is not None:
         try:
-            await anyio.to_thread.run_sync(mav.ping)
+            await v.commands.submit(CommandLane.GENERIC, mav.ping, inline=mav.is_async)
             mav_ping = {"ok": True}
         except Exception as e:
             mav_ping = {"ok": False, "error": f"{type(e).__name__}: {e}"}
 
-    video = await anyio.to_thread.run_sync(_check_video_url, video_url)
+    # Probed in the background; a dead camera no longer delays the check.
+    video = shared.video_probe.result()
 
     return JSONResponse(
         {
-            "ok": bool(tel.connected) and bool(mav_ping.get("ok")),
+            "ok": bool(tel["connected"]) and bool(mav_ping.get("ok")),
             "mavlink": {
-                "connected": tel.connected,
-                "last_heartbeat_age_s": tel.last_heartbeat_age_s,
-                "armed": tel.armed,
-                "mode": tel.mode,
+                "vehicle": v.id,
+                "sysid": v.sysid,
+                "connected": tel["connected"],
+                "last_heartbeat_age_s": snap.heartbeat_age_s(),
+                "armed": tel["armed"],
+                "mode": tel["mode"],
                 "ping": mav_ping,
+                "rx": None if mav is None else mav.rx_stats.to_dict(),
+                "replay": mav.master.stats() if mav is not None and mav.is_replay and mav.master else None,
             },
             "video": video,
+            "video_relay": {
+                **shared.video_relay.stats(),
+                "reencode": shared.video_scaler.available,
+                "encoded": shared.video_scaler.encoded,
+            },
+            "tlog": None if v.recorder is None else v.recorder.stats(),
+            "router": v.router_stats(),
+            "commands": v.commands.stats(),
+            "acks": v.acks.stats(),
+            "rc": v.rc.stats(),
+            "config": shared.config.stats(),
         }
     )
 
@@ -198,9 +376,85 @@ async def _send_json(ws: WebSocket, payload: dict[str, Any]) -> None:
     await ws.send_text(json.dumps(payload, ensure_ascii=False))
 
 
-async def _run_command(cmd: CommandRequest) -> CommandResponse:
-    with shared.lock:
-        mav = shared.mav
+def _mav_send(
+    vehicle: Vehicle, mav: MavlinkClient, cmd: CommandRequest, fn: Callable[..., Any], *args: Any, **kwargs: Any
+) -> asyncio.Future:
+    # Every send goes through the vehicle's CommandSender (priority lanes + coalescing).
+    # Asyncio links write inline on the loop; pymavlink thread links on the sender's own thread.
+    return vehicle.commands.submit(
+        command_lane(cmd),
+        functools.partial(fn, *args, **kwargs),
+        inline=mav.is_async,
+        key=coalesce_key(cmd),
+    )
+
+
+# MAV_CMD ids of the commands whose COMMAND_ACK we wait for.
+_MAV_CMD_DO_SET_MODE = 176
+_MAV_CMD_PREFLIGHT_REBOOT_SHUTDOWN = 246
+_MAV_CMD_COMPONENT_ARM_DISARM = 400
+
+
+async def _send_acked(
+    vehicle: Vehicle,
+    mav: MavlinkClient,
+    cmd: CommandRequest,
+    mav_cmd: int,
+    fn: Callable[..., Any],
+    *,
+    confirmation: int = 0,
+    **kwargs: Any,
+) -> AckResult:
+    """Send a COMMAND_LONG and wait for its COMMAND_ACK; retries bump `confirmation`."""
+
+    async def send(attempt: int) -> float:
+        def write() -> float:
+            fn(confirmation=confirmation + attempt, **kwargs)
+            return time.monotonic()
+
+        return await _mav_send(vehicle, mav, cmd, write)
+
+    return await _await_ack(vehicle, cmd, mav_cmd, send)
+
+
+async def _await_ack(
+    vehicle: Vehicle, cmd: CommandRequest, mav_cmd: int, send: Callable[[int], Awaitable[float]]
+) -> AckResult:
+    # Raw COMMAND_LONGs get a histogram per MAV_CMD id.
+    name = f"command_long:{mav_cmd}" if cmd.command == "command_long" else cmd.command
+    return await vehicle.acks.run(
+        name,
+        mav_cmd,
+        send,
+        timeout_s=float(shared.cfg.get("command_ack_timeout_s") or DEFAULT_ACK_TIMEOUT_S),
+        retries=int(shared.cfg.get("command_retries", DEFAULT_RETRIES)),
+        # A disarm must not wait out a pending arm's retries (both are MAV_CMD 400).
+        preempt=command_lane(cmd) is CommandLane.EMERGENCY,
+    )
+
+
+def _ack_response(vehicle: Vehicle, ack: AckResult) -> CommandResponse:
+    if ack.ok:
+        message = "OK"
+    elif ack.preempted:
+        message = "Superseded by an emergency command"
+    elif ack.result is None:
+        message = f"No COMMAND_ACK after {ack.attempts} attempt(s)"
+    else:
+        message = f"Rejected: {ack.result_name}"
+    return CommandResponse(
+        ok=ack.ok,
+        message=message,
+        command=ack.command,
+        result=ack.result_name,
+        attempts=ack.attempts,
+        latency_ms=None if ack.latency_ms is None else round(ack.latency_ms, 2),
+        latency=vehicle.acks.histograms[ack.command].to_dict(),
+    )
+
+
+async def _run_command(vehicle: Vehicle, cmd: CommandRequest) -> CommandResponse:
+    mav = vehicle.mav
     if mav is None:
         return CommandResponse(ok=False, message="MAVLink: not connected")
 
@@ -210,31 +464,54 @@ async def _run_command(cmd: CommandRequest) -> CommandResponse:
         # Note: we return command_result separately; this event is just "what we tried to send".
         # WebSocket handler will send MavOutEvent before calling this function if needed.
         if cmd.command == "arm":
-            await anyio.to_thread.run_sync(mav.arm)
+            ack = await _send_acked(vehicle, mav, cmd, _MAV_CMD_COMPONENT_ARM_DISARM, mav.arm)
         elif cmd.command == "disarm":
-            await anyio.to_thread.run_sync(mav.disarm)
+            ack = await _send_acked(vehicle, mav, cmd, _MAV_CMD_COMPONENT_ARM_DISARM, mav.disarm)
         elif cmd.command == "set_mode":
             mode = str(cmd.params.get("mode", "")).strip().upper()
             if not mode:
                 raise MavlinkError("Missing params.mode")
-            await anyio.to_thread.run_sync(mav.set_mode, mode)
-            with shared.lock:
-                shared.telemetry.data.mode = mode
+            sent_mode = mode
+
+            async def send_mode(attempt: int) -> float:
+                nonlocal sent_mode
+
+                def set_mode() -> tuple[str, float]:
+                    mav.set_mode(mode, confirmation=attempt)
+                    return mode, time.monotonic()
+
+                # A newer queued set_mode may replace ours: report the mode that was actually sent.
+                sent_mode, sent_ts = await _mav_send(vehicle, mav, cmd, set_mode)
+                return sent_ts
+
+            ack = await _await_ack(vehicle, cmd, _MAV_CMD_DO_SET_MODE, send_mode)
+            if ack.ok:
+                # Applied by the RX side (single writer); the next HEARTBEAT confirms it.
+                vehicle.telemetry.submit(lambda t: t.set("mode", sent_mode))
         elif cmd.command == "reboot_autopilot":
-            await anyio.to_thread.run_sync(mav.reboot_autopilot)
+            ack = await _send_acked(vehicle, mav, cmd, _MAV_CMD_PREFLIGHT_REBOOT_SHUTDOWN, mav.reboot_autopilot)
         elif cmd.command == "rc_override":
+            # RC_CHANNELS_OVERRIDE is a stream, not a command: no ACK.
             steering_pwm = cmd.params.get("steering_pwm", None)
             throttle_pwm = cmd.params.get("throttle_pwm", None)
-            await anyio.to_thread.run_sync(
+            await _mav_send(
+                vehicle,
+                mav,
+                cmd,
                 mav.rc_override,
                 steering_pwm=None if steering_pwm is None else int(steering_pwm),
                 throttle_pwm=None if throttle_pwm is None else int(throttle_pwm),
             )
+            return CommandResponse(ok=True, message="OK")
         elif cmd.command == "command_long":
             cmd_id = int(cmd.params.get("cmd_id", 0))
             if cmd_id <= 0:
                 raise MavlinkError("Missing/invalid params.cmd_id")
-            await anyio.to_thread.run_sync(
+            ack = await _send_acked(
+                vehicle,
+                mav,
+                cmd,
+                cmd_id,
                 mav.command_long,
                 cmd_id=cmd_id,
                 p1=float(cmd.params.get("p1", 0.0)),
@@ -248,30 +525,114 @@ async def _run_command(cmd: CommandRequest) -> CommandResponse:
             )
         else:
             return CommandResponse(ok=False, message=f"Unknown command: {cmd.command}")
-        return CommandResponse(ok=True, message="OK")
+        return _ack_response(vehicle, ack)
     except Exception as e:
         return CommandResponse(ok=False, message=f"{type(e).__name__}: {e}")
 
 
+def _apply_subscription(sub: TelemetrySubscription, req: SubscribeRequest) -> None:
+    if req.delta is not None:
+        sub.delta = req.delta
+    if req.encoding is not None:
+        sub.encoding = req.encoding
+    if req.rate_hz is not None:
+        sub.max_rate_hz = req.rate_hz
+        sub.min_rate_hz = min(sub.min_rate_hz, req.rate_hz)
+    if req.min_rate_hz is not None:
+        sub.min_rate_hz = min(sub.max_rate_hz, req.min_rate_hz)
+    sub.set_groups(None if req.groups is None else list(req.groups))
+
+
 @app.websocket("/ws")
 async def ws_endpoint(ws: WebSocket) -> None:
     await ws.accept()
-    await _send_json(ws, ServerEvent(message="WS connected").model_dump())
 
-    async def telemetry_loop() -> None:
-        while True:
-            with shared.lock:
-                m = shared.telemetry.to_model()
-            evt = TelemetryEvent(data=m)
-            await _send_json(ws, evt.model_dump())
-            await anyio.sleep(0.25)
+    # /ws?vehicle=<id|sysid> => telemetry of that vehicle, commands go to it by default
+    # /ws?delta=1 => send only changed fields between periodic keyframes
+    # /ws?max_hz=20&min_hz=1 => push on change, at most max_hz, keepalive at min_hz
+    # /ws?encoding=msgpack => binary telemetry frames
+    q = ws.query_params
+    vehicle = shared.vehicles.get(q.get("vehicle"))
+    if vehicle is None:
+        await _send_json(ws, ServerEvent(level="error", message=f"Unknown vehicle: {q.get('vehicle')}").model_dump())
+        await ws.close(code=1008)
+        return
+    await _send_json(ws, ServerEvent(message=f"WS connected: {vehicle.name}").model_dump())
+
+    delta = q.get("delta", "") in ("1", "true")
+    encoding = "msgpack" if q.get("encoding") == "msgpack" else "json"
+    try:
+        sub = TelemetrySubscription(
+            delta=delta,
+            encoding=encoding,
+            max_rate_hz=float(q.get("max_hz") or DEFAULT_MAX_RATE_HZ),
+            min_rate_hz=float(q.get("min_hz") or DEFAULT_MIN_RATE_HZ),
+        )
+    except ValueError:
+        sub = TelemetrySubscription(delta=delta, encoding=encoding)
+
+    # RC streams this connection drives; released when it goes away.
+    rc_driven: set[Vehicle] = set()
+
+    host = ws.client.host if ws.client else ""
 
-    async def receive_loop() -> None:
+    async def telemetry_loop() -> None:
+        # The frame is encoded once per tick by the shared broadcaster, not per client.
+        async for frame in vehicle.broadcaster.subscribe(sub):
+            t0 = time.monotonic()
+            if isinstance(frame.payload, bytes):
+                await ws.send_bytes(frame.payload)
+            else:
+                await ws.send_text(frame.payload)
+            # Slow sends => this client's link is congested; its video viewers back off.
+            shared.links.record(host, time.monotonic() - t0)
+
+    async def run_command(target: Vehicle, cmd: CommandRequest) -> None:
+        res = await _run_command(target, cmd)
+        await _send_json(ws, res.model_dump())
+
+    def handle_rc(req: RcRequest) -> None:
+        target = vehicle if req.vehicle is None else shared.vehicles.get(req.vehicle)
+        if target is None:
+            raise ValueError(f"Unknown vehicle: {req.vehicle}")
+        if req.release:
+            target.rc.release(ws)
+            rc_driven.discard(target)
+            return
+        target.rc.set(ws, req.steering_pwm, req.throttle_pwm)
+        rc_driven.add(target)
+
+    async def receive_loop(tg: anyio.abc.TaskGroup) -> None:
         while True:
             raw = await ws.receive_text()
             try:
                 obj = json.loads(raw)
+                msg_type = obj.get("type") if isinstance(obj, dict) else None
+                if msg_type == "rc":
+                    # Hot path: no mav_out / command_result echo per update.
+                    handle_rc(RcRequest.model_validate(obj))
+                    continue
+                if msg_type == "resync":
+                    ResyncRequest.model_validate(obj)
+                    sub.resync()
+                    vehicle.notifier.kick()
+                    continue
+                if msg_type == "subscribe":
+                    req = SubscribeRequest.model_validate(obj)
+                    _apply_subscription(sub, req)
+                    vehicle.notifier.kick()
+                    await _send_json(
+                        ws,
+                        ServerEvent(
+                            message=f"Subscribed: groups={req.groups or 'all'} "
+                            f"rate={sub.max_rate_hz:g}Hz delta={sub.delta} encoding={sub.encoding}"
+                        ).model_dump(),
+                    )
+                    continue
                 cmd = CommandRequest.model_validate(obj)
+                target = vehicle if cmd.vehicle is None else shared.vehicles.get(cmd.vehicle)
+                if target is None:
+                    raise ValueError(f"Unknown vehicle: {cmd.vehicle}")
             except Exception as e:
                 await _send_json(
                     ws,
@@ -284,6 +645,7 @@ async def ws_endpoint(ws: WebSocket) -> None:
                 await _send_json(
                     ws,
                     MavOutEvent(
+                        vehicle=target.id,
                         name=cmd.command,
                         params=cmd.params,
                         ts_ms=int(time.time() * 1000),
@@ -292,13 +654,25 @@ async def ws_endpoint(ws: WebSocket) -> None:
             except Exception:
                 pass
 
-            res = await _run_command(cmd)
-            await _send_json(ws, res.model_dump())
+            # Not awaited here: a DISARM read after a burst of rc_override must be able to
+            # overtake it in the vehicle's command queue.
+            tg.start_soon(run_command, target, cmd)
+
+    async def until_disconnect(fn: Callable[..., Awaitable[None]], tg: anyio.abc.TaskGroup, *args: Any) -> None:
+        # Either side noticing the disconnect ends the whole connection. Handled here, not
+        # around the task group, which would wrap it in an ExceptionGroup.
+        try:
+            await fn(*args)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            tg.cancel_scope.cancel()
 
     try:
         async with anyio.create_task_group() as tg:
-            tg.start_soon(telemetry_loop)
-            tg.start_soon(receive_loop)
-    except WebSocketDisconnect:
-        return
+            tg.start_soon(until_disconnect, telemetry_loop, tg)
+            tg.start_soon(until_disconnect, receive_loop, tg, tg)
+    finally:
+        for v in rc_driven:
+            v.rc.release(ws)
 
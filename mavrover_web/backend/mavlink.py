@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import threading
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+from .acks import GCS_COMPONENT_ID, GCS_SYSTEM_ID
 
 
 class MavlinkError(RuntimeError):
@@ -12,6 +15,43 @@ class MavlinkError(RuntimeError):
 class MavlinkConfig:
     serial_port: str
     baudrate: int = 115200
+    # Fixed target sysid (several vehicles behind one radio); None => from the first heartbeat.
+    target_system: int | None = None
+
+
+@dataclass
+class RxStats:
+    """Counters for batched ingestion (see MavlinkClient.recv_batch)."""
+
+    batches: int = 0
+    messages: int = 0
+    last_batch: int = 0
+    max_batch: int = 0
+    # batch size histogram: buckets 1, 2-3, 4-7, 8-15, ... (index = bit_length - 1)
+    histogram: list[int] = field(default_factory=lambda: [0] * 10)
+    started_ts: float | None = None
+
+    def record(self, n: int) -> None:
+        if self.started_ts is None:
+            self.started_ts = time.monotonic()
+        self.batches += 1
+        self.messages += n
+        self.last_batch = n
+        if n > self.max_batch:
+            self.max_batch = n
+        self.histogram[min(len(self.histogram) - 1, n.bit_length() - 1)] += 1
+
+    def to_dict(self) -> dict:
+        elapsed = 0.0 if self.started_ts is None else time.monotonic() - self.started_ts
+        return {
+            "rate_msg_s": round(self.messages / elapsed, 1) if elapsed > 0 else 0.0,
+            "batches": self.batches,
+            "messages": self.messages,
+            "avg_batch": round(self.messages / self.batches, 2) if self.batches else 0.0,
+            "last_batch": self.last_batch,
+            "max_batch": self.max_batch,
+            "histogram": list(self.histogram),
+        }
 
 
 class MavlinkClient:
@@ -24,6 +64,27 @@ class MavlinkClient:
         self.cfg = cfg
         self.master = None
         self._last_mode_str: str | None = None
+        self.rx_stats = RxStats()
+        self._tx_lock = threading.Lock()
+
+    @property
+    def is_replay(self) -> bool:
+        return self.cfg.serial_port.startswith("replay:")
+
+    @property
+    def is_async(self) -> bool:
+        """True when master is an AsyncMavlinkConnection: sends run on the event loop, no thread hop."""
+        return bool(getattr(self.master, "is_async", False))
+
+    async def connect_async(self, on_batch) -> None:
+        """Open the link on the running event loop; parsed batches go to on_batch(msgs)."""
+        from .aio_transport import AsyncMavlinkConnection
+
+        conn = AsyncMavlinkConnection(self.cfg.serial_port, self.cfg.baudrate, on_batch)
+        await conn.open()
+        if self.cfg.target_system:
+            conn.target_system = self.cfg.target_system
+        self.master = conn
 
     def connect(self, heartbeat_timeout_s: float = 8.0) -> None:
         try:
@@ -32,10 +93,21 @@ class MavlinkClient:
             raise MavlinkError(f"pymavlink import failed: {e}") from e
 
         port = self.cfg.serial_port
+        if self.is_replay:
+            # replay:<path.tlog>[?speed=N][&loop=1] -- recorded flight instead of a live link
+            from .replay import TlogReplay, parse_replay_port
+
+            path, speed, loop = parse_replay_port(port)
+            self.master = TlogReplay(path, speed=speed, loop=loop)
+            return
         if port.startswith(("udp:", "tcp:", "udpin:", "udpout:")):
-            self.master = mavutil.mavlink_connection(port)
+            self.master = mavutil.mavlink_connection(
+                port, source_system=GCS_SYSTEM_ID, source_component=GCS_COMPONENT_ID
+            )
         else:
-            self.master = mavutil.mavlink_connection(port, baud=self.cfg.baudrate)
+            self.master = mavutil.mavlink_connection(
+                port, baud=self.cfg.baudrate, source_system=GCS_SYSTEM_ID, source_component=GCS_COMPONENT_ID
+            )
 
         # Best-effort: wait for heartbeat to confirm link
         try:
@@ -43,6 +115,8 @@ class MavlinkClient:
         except Exception:
             # Link may still become alive later; don't hard-fail here.
             pass
+        if self.cfg.target_system:
+            self.master.target_system = self.cfg.target_system
 
     def close(self) -> None:
         if self.master is not None:
@@ -56,6 +130,37 @@ class MavlinkClient:
             raise MavlinkError("Not connected")
         return self.master.recv_match(blocking=True, timeout=timeout_s)
 
+    def recv_batch(self, timeout_s: float = 1.0, max_batch: int = 512) -> list:
+        """
+        Block for the first message (up to timeout_s), then drain everything that is
+        already buffered without blocking. Returns [] on timeout.
+        """
+        if self.master is None:
+            raise MavlinkError("Not connected")
+        msg = self.master.recv_match(blocking=True, timeout=timeout_s)
+        if msg is None:
+            return []
+        batch = [msg]
+        while len(batch) < max_batch:
+            msg = self.master.recv_match(blocking=False)
+            if msg is None:
+                break
+            batch.append(msg)
+        self.rx_stats.record(len(batch))
+        return batch
+
+    def write_raw(self, frame: bytes) -> None:
+        """
+        Write an already-encoded MAVLink frame (router uplink) as one piece.
+        Every send path holds _tx_lock, so frames from different threads never interleave.
+        """
+        if self.master is None:
+            raise MavlinkError("Not connected")
+        if self.is_replay:
+            raise MavlinkError("Replay source is read-only")
+        with self._tx_lock:
+            self.master.write(frame)
+
     def mode_string_from_heartbeat(self, hb_msg) -> str | None:
         """
         Uses pymavlink helper to translate custom_mode into a readable string.
@@ -73,87 +178,116 @@ class MavlinkClient:
             return None
         return None
 
-    def arm(self) -> None:
+    def arm(self, confirmation: int = 0) -> None:
         if self.master is None:
             raise MavlinkError("Not connected")
         from pymavlink.dialects.v20 import common as mavlink2
 
-        self.master.mav.command_long_send(
-            self.master.target_system,
-            self.master.target_component,
-            mavlink2.MAV_CMD_COMPONENT_ARM_DISARM,
-            0,
-            1,  # arm
-            0,
-            0,
-            0,
-            0,
-            0,
-            0,
-        )
-
-    def disarm(self) -> None:
+        with self._tx_lock:
+            self.master.mav.command_long_send(
+                self.master.target_system,
+                self.master.target_component,
+                mavlink2.MAV_CMD_COMPONENT_ARM_DISARM,
+                confirmation,
+                1,  # arm
+                0,
+                0,
+                0,
+                0,
+                0,
+                0,
+            )
+
+    def disarm(self, confirmation: int = 0) -> None:
         if self.master is None:
             raise MavlinkError("Not connected")
         from pymavlink.dialects.v20 import common as mavlink2
 
-        self.master.mav.command_long_send(
-            self.master.target_system,
-            self.master.target_component,
-            mavlink2.MAV_CMD_COMPONENT_ARM_DISARM,
-            0,
-            0,  # disarm
-            0,
-            0,
-            0,
-            0,
-            0,
-            0,
-        )
-
-    def set_mode(self, mode: str) -> None:
+        with self._tx_lock:
+            self.master.mav.command_long_send(
+                self.master.target_system,
+                self.master.target_component,
+                mavlink2.MAV_CMD_COMPONENT_ARM_DISARM,
+                confirmation,
+                0,  # disarm
+                0,
+                0,
+                0,
+                0,
+                0,
+                0,
+            )
+
+    def set_mode(self, mode: str, confirmation: int = 0) -> None:
         """
         mode: e.g. MANUAL / HOLD / AUTO
+
+        ArduPilot (integer custom modes): sent here as MAV_CMD_DO_SET_MODE, like
+        mavfile.set_mode_apm, so retries can bump confirmation. Anything else (PX4's
+        (main, sub) mode tuples, or no mode list yet) goes through pymavlink's own
+        set_mode dispatch, which always sends confirmation 0.
         """
         if self.master is None:
             raise MavlinkError("Not connected")
+        from pymavlink.dialects.v20 import common as mavlink2
 
         mode = mode.strip().upper()
         mapping = {}
         try:
-            mapping = self.master.mode_mapping()
+            mapping = self.master.mode_mapping() or {}
         except Exception:
             mapping = {}
 
         if mapping and mode not in mapping:
             raise MavlinkError(f"Mode '{mode}' not supported by autopilot. Supported: {sorted(mapping.keys())}")
 
-        # APM stacks typically support set_mode with string
-        try:
-            self.master.set_mode(mode)
-        except Exception as e:
-            raise MavlinkError(f"Failed to set mode {mode}: {e}") from e
+        custom_mode = mapping.get(mode)
+        if isinstance(custom_mode, int):
+            with self._tx_lock:
+                self.master.mav.command_long_send(
+                    self.master.target_system,
+                    self.master.target_component,
+                    mavlink2.MAV_CMD_DO_SET_MODE,
+                    confirmation,
+                    mavlink2.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED,
+                    custom_mode,
+                    0,
+                    0,
+                    0,
+                    0,
+                    0,
+                )
+        elif hasattr(self.master, "set_mode"):
+            try:
+                with self._tx_lock:
+                    self.master.set_mode(mode)
+            except Exception as e:
+                raise MavlinkError(f"Failed to set mode {mode}: {e}") from e
+        else:
+            # The asyncio link only knows ArduPilot mode lists (from the HEARTBEAT type).
+            raise MavlinkError("Mode list unknown: no HEARTBEAT from the autopilot yet")
 
         self._last_mode_str = mode
 
-    def reboot_autopilot(self) -> None:
+    def reboot_autopilot(self, confirmation: int = 0) -> None:
         if self.master is None:
             raise MavlinkError("Not connected")
         from pymavlink.dialects.v20 import common as mavlink2
 
-        self.master.mav.command_long_send(
-            self.master.target_system,
-            self.master.target_component,
-            mavlink2.MAV_CMD_PREFLIGHT_REBOOT_SHUTDOWN,
-            0,
-            1,  # reboot autopilot
-            0,
-            0,
-            0,
-            0,
-            0,
-            0,
-        )
+        with self._tx_lock:
+            self.master.mav.command_long_send(
+                self.master.target_system,
+                self.master.target_component,
+                mavlink2.MAV_CMD_PREFLIGHT_REBOOT_SHUTDOWN,
+                confirmation,
+                1,  # reboot autopilot
+                0,
+                0,
+                0,
+                0,
+                0,
+                0,
+            )
 
     def ping(self) -> None:
         if self.master is None:
@@ -161,7 +295,8 @@ class MavlinkClient:
         from pymavlink.dialects.v20 import common as mavlink2
 
         now_us = int(time.time() * 1_000_000)
-        self.master.mav.ping_send(now_us, 0, 0, 0)
+        with self._tx_lock:
+            self.master.mav.ping_send(now_us, 0, 0, 0)
 
     def rc_override(self, *, steering_pwm: int | None = None, throttle_pwm: int | None = None) -> None:
         """
@@ -184,18 +319,19 @@ class MavlinkClient:
         ch1 = _pwm(steering_pwm)
         ch3 = _pwm(throttle_pwm)
         # channels: 1..8
-        self.master.mav.rc_channels_override_send(
-            self.master.target_system,
-            self.master.target_component,
-            ch1,  # chan1_raw (steering)
-            0,  # chan2_raw
-            ch3,  # chan3_raw (throttle)
-            0,  # chan4_raw
-            0,  # chan5_raw
-            0,  # chan6_raw
-            0,  # chan7_raw
-            0,  # chan8_raw
-        )
+        with self._tx_lock:
+            self.master.mav.rc_channels_override_send(
+                self.master.target_system,
+                self.master.target_component,
+                ch1,  # chan1_raw (steering)
+                0,  # chan2_raw
+                ch3,  # chan3_raw (throttle)
+                0,  # chan4_raw
+                0,  # chan5_raw
+                0,  # chan6_raw
+                0,  # chan7_raw
+                0,  # chan8_raw
+            )
 
     def command_long(
         self,
@@ -219,17 +355,18 @@ class MavlinkClient:
         """
         if self.master is None:
             raise MavlinkError("Not connected")
-        self.master.mav.command_long_send(
-            self.master.target_system,
-            self.master.target_component,
-            int(cmd_id),
-            int(confirmation),
-            float(p1),
-            float(p2),
-            float(p3),
-            float(p4),
-            float(p5),
-            float(p6),
-            float(p7),
-        )
+        with self._tx_lock:
+            self.master.mav.command_long_send(
+                self.master.target_system,
+                self.master.target_component,
+                int(cmd_id),
+                int(confirmation),
+                float(p1),
+                float(p2),
+                float(p3),
+                float(p4),
+                float(p5),
+                float(p6),
+                float(p7),
+            )
 
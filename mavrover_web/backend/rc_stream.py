@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable
+
+DEFAULT_RC_RATE_HZ = 25.0
+# No input from the owning client for this long => release the override (deadman).
+DEFAULT_RC_TIMEOUT_S = 0.5
+
+# send(steering_pwm, throttle_pwm); None releases that channel back to the RC transmitter.
+RcSender = Callable[[int | None, int | None], Awaitable[Any]]
+
+
+class RcStream:
+    """
+    Server-side RC_CHANNELS_OVERRIDE stream for one vehicle.
+
+    Clients only set a target (steering/throttle PWM); a timer task on the event loop
+    sends the latest target at a fixed rate, so updates arriving faster than that collapse
+    to the newest one and a change waits at most one tick. The last client to set a target
+    owns the stream; the override is released when the owner says so, disconnects, or
+    goes silent for `timeout_s`. A target set but not yet sent when the override is
+    released (typically neutral right before the release) still goes out first.
+    """
+
+    def __init__(
+        self,
+        send: RcSender,
+        *,
+        rate_hz: float = DEFAULT_RC_RATE_HZ,
+        timeout_s: float = DEFAULT_RC_TIMEOUT_S,
+    ) -> None:
+        self._send = send
+        self.rate_hz = rate_hz
+        self.timeout_s = timeout_s
+        self.steering_pwm: int | None = None
+        self.throttle_pwm: int | None = None
+        self.owner: object | None = None
+        self._last_sent: tuple[int | None, int | None] | None = None
+        self._last_input = 0.0
+        self._task: asyncio.Task | None = None
+        # stats
+        self.updates = 0
+        self.sent = 0
+        self.failed = 0
+        self.deadman_releases = 0
+
+    @property
+    def active(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def configure(self, *, rate_hz: float | None = None, timeout_s: float | None = None) -> None:
+        if rate_hz is not None and rate_hz > 0:
+            self.rate_hz = min(float(rate_hz), 100.0)
+        if timeout_s is not None and timeout_s > 0:
+            self.timeout_s = float(timeout_s)
+
+    def set(self, owner: object, steering_pwm: int | None, throttle_pwm: int | None) -> None:
+        """Set the target (or just keep it alive). Must be called on the event loop."""
+        self.updates += 1
+        self._last_input = time.monotonic()
+        self.owner = owner
+        self.steering_pwm = steering_pwm
+        self.throttle_pwm = throttle_pwm
+        if not self.active:
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="rc-stream")
+
+    def release(self, owner: object | None = None) -> bool:
+        """Stop streaming and hand the channels back; `owner` must match unless None."""
+        if owner is not None and owner is not self.owner:
+            return False
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        was_active = self.owner is not None
+        target = (self.steering_pwm, self.throttle_pwm)
+        unsent = target if was_active and target != self._last_sent else None
+        self.owner = None
+        self.steering_pwm = self.throttle_pwm = None
+        self._last_sent = None
+        if was_active:
+            asyncio.get_running_loop().create_task(self._release(unsent))
+        return was_active
+
+    async def _release(self, unsent: tuple[int | None, int | None] | None) -> None:
+        for target in (unsent, (None, None)):
+            if target is None:
+                continue
+            try:
+                await self._send(*target)
+                self.sent += 1
+            except Exception:
+                self.failed += 1
+
+    async def _run(self) -> None:
+        period = 1.0 / self.rate_hz
+        next_tick = time.monotonic()
+        while True:
+            if time.monotonic() - self._last_input > self.timeout_s:
+                self.deadman_releases += 1
+                self._task = None
+                self.release()
+                return
+            target = (self.steering_pwm, self.throttle_pwm)
+            try:
+                await self._send(*target)
+                self.sent += 1
+                self._last_sent = target
+            except Exception:
+                self.failed += 1
+            next_tick = max(next_tick + period, time.monotonic())
+            await asyncio.sleep(next_tick - time.monotonic())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.owner = None
+        self._last_sent = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "active": self.active,
+            "rate_hz": self.rate_hz,
+            "timeout_s": self.timeout_s,
+            "steering_pwm": self.steering_pwm,
+            "throttle_pwm": self.throttle_pwm,
+            "updates": self.updates,
+            "sent": self.sent,
+            "failed": self.failed,
+            "deadman_releases": self.deadman_releases,
+        }
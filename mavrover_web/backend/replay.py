@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qs
+
+from .mavlink import MavlinkError
+
+
+def parse_replay_port(port: str) -> tuple[str, float, bool]:
+    """
+    "replay:logs/x.tlog?speed=4&loop=1" -> ("logs/x.tlog", 4.0, True).
+    speed=0 replays as fast as possible; default is real time (1.0).
+    """
+    spec = port[len("replay:") :]
+    path, _, query = spec.partition("?")
+    q = parse_qs(query)
+    try:
+        speed = float(q.get("speed", ["1"])[0])
+    except ValueError as e:
+        raise MavlinkError(f"Bad replay speed in {port!r}") from e
+    loop = q.get("loop", ["0"])[0] in ("1", "true", "yes")
+    return path, max(0.0, speed), loop
+
+
+class TlogReplay:
+    """
+    Read-only stand-in for a pymavlink connection that plays a recorded tlog back
+    through the normal recv_match() -> handle_mavlink_message -> /ws pipeline.
+
+    Messages are released according to their recorded timestamps divided by `speed`
+    (speed=0: no pacing). Any attempt to transmit raises MavlinkError.
+    """
+
+    def __init__(self, path: str | Path, speed: float = 1.0, loop: bool = False):
+        self.path = Path(path)
+        if not self.path.is_file():
+            raise MavlinkError(f"Replay file not found: {self.path}")
+        self.speed = speed
+        self.loop = loop
+        self.target_system = 0
+        self.target_component = 0
+        self.finished = False
+        self.frames = 0
+        self.loops = 0
+        self._log: Any = None
+        self._pending: Any = None
+        self._t0_log: float | None = None
+        self._t0_wall = 0.0
+        self._open()
+
+    def _open(self) -> None:
+        from pymavlink import mavutil
+
+        if self._log is not None:
+            self._log.close()
+        self._log = mavutil.mavlink_connection(str(self.path))
+        self._t0_log = None
+        self._pending = None
+
+    def _read(self) -> Any:
+        while True:
+            msg = self._log.recv_match()
+            if msg is not None:
+                return msg
+            if not self.loop:
+                self.finished = True
+                return None
+            self.loops += 1
+            self._open()
+
+    def recv_match(self, blocking: bool = False, timeout: float | None = None, **_: Any) -> Any:
+        msg = self._pending
+        self._pending = None
+        if msg is None:
+            msg = None if self.finished else self._read()
+        if msg is None:
+            if blocking and timeout:
+                time.sleep(timeout)
+            return None
+
+        if self.speed > 0:
+            ts = getattr(msg, "_timestamp", None) or 0.0
+            if self._t0_log is None:
+                self._t0_log = ts
+                self._t0_wall = time.monotonic()
+            delay = self._t0_wall + (ts - self._t0_log) / self.speed - time.monotonic()
+            if delay > 0:
+                if not blocking or (timeout is not None and delay > timeout):
+                    if blocking and timeout:
+                        time.sleep(timeout)
+                    self._pending = msg
+                    return None
+                time.sleep(delay)
+
+        self.frames += 1
+        return msg
+
+    def wait_heartbeat(self, timeout: float | None = None) -> None:
+        return None
+
+    def close(self) -> None:
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    @property
+    def mav(self) -> Any:
+        raise MavlinkError("Replay source is read-only")
+
+    def mode_mapping(self) -> dict:
+        return {}
+
+    def set_mode(self, mode: str) -> None:
+        raise MavlinkError("Replay source is read-only")
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "file": self.path.name,
+            "speed": self.speed,
+            "loop": self.loop,
+            "frames": self.frames,
+            "loops": self.loops,
+            "finished": self.finished,
+        }
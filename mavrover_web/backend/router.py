@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+import queue
+import socket
+import threading
+from typing import Any, Callable, Iterator
+
+from .logstore import frame_info
+
+DEFAULT_QUEUE_SIZE = 2000
+# Downlink frames are coalesced into datagrams of at most this size (one MTU).
+UDP_MAX_DATAGRAM = 1400
+TCP_SEND_TIMEOUT_S = 5.0
+
+
+class FrameSplitter:
+    """
+    Re-frames an uplink byte stream (TCP chunks, UDP datagrams) into whole MAVLink
+    frames by their headers, without decoding them. Garbage is skipped until the next
+    v1/v2 magic byte.
+    """
+
+    def __init__(self) -> None:
+        self._buf = bytearray()
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        buf = self._buf
+        buf += data
+        pos = 0
+        while pos < len(buf):
+            if buf[pos] not in (0xFE, 0xFD):
+                pos += 1
+                continue
+            info = frame_info(buf, pos)
+            if info is None or pos + info[0] > len(buf):
+                break  # incomplete header/frame: wait for more bytes
+            yield bytes(buf[pos : pos + info[0]])
+            pos += info[0]
+        del buf[:pos]
+
+
+class _Peer:
+    """
+    One downstream consumer: bounded queue + sender thread. submit() never blocks;
+    when the consumer is slow its queue fills up and frames are dropped (counted)
+    for that consumer only.
+    """
+
+    def __init__(self, name: str, send: Callable[[bytes], None], *, queue_size: int, max_chunk: int | None) -> None:
+        self.name = name
+        self._send = send
+        self._max_chunk = max_chunk
+        self._q: queue.Queue[bytes | None] = queue.Queue(maxsize=queue_size)
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.bytes_sent = 0
+        self.closed = False
+        self.error: str | None = None
+        self._thread = threading.Thread(target=self._run, name=f"router-tx-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, buf: bytes) -> None:
+        try:
+            self._q.put_nowait(buf)
+        except queue.Full:
+            self.frames_dropped += 1
+
+    def close(self) -> None:
+        self.closed = True
+        try:
+            self._q.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def _run(self) -> None:
+        while not self.closed:
+            first = self._q.get()
+            if first is None:
+                break
+            batch = [first]
+            size = len(first)
+            while self._max_chunk is None or size < self._max_chunk:
+                try:
+                    buf = self._q.get_nowait()
+                except queue.Empty:
+                    break
+                if buf is None:
+                    self.closed = True
+                    break
+                if self._max_chunk is not None and size + len(buf) > self._max_chunk:
+                    self._flush(batch)
+                    batch, size = [], 0
+                batch.append(buf)
+                size += len(buf)
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch: list[bytes]) -> None:
+        data = b"".join(batch)
+        try:
+            self._send(data)
+        except OSError as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.frames_dropped += len(batch)
+            return
+        self.frames_sent += len(batch)
+        self.bytes_sent += len(data)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "peer": self.name,
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self.frames_dropped,
+            "bytes_sent": self.bytes_sent,
+            "queue": self._q.qsize(),
+            "error": self.error,
+        }
+
+
+def _parse_addr(spec: str) -> tuple[str, int]:
+    host, _, port = spec.rpartition(":")
+    return host or "0.0.0.0", int(port)
+
+
+class _UdpOutput:
+    """
+    udpout:host:port -- send to a fixed address (e.g. Mission Planner listening on 14550).
+    udpin:addr:port  -- listen; send to whoever sent to us last.
+    udp:addr:port    -- same as udpin, as in pymavlink.
+    Uplink datagrams from either side are passed to `uplink` frame by frame.
+    """
+
+    def __init__(self, spec: str, uplink: Callable[[bytes], None], queue_size: int) -> None:
+        kind, _, addr = spec.partition(":")
+        self.spec = spec
+        self._uplink = uplink
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._dest: tuple[str, int] | None = None
+        if kind in ("udpin", "udp"):
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._sock.bind(_parse_addr(addr))
+        else:
+            self._dest = _parse_addr(addr)
+        self._closed = False
+        self.frames_in = 0
+        self.peer = _Peer(spec, self._sendto, queue_size=queue_size, max_chunk=UDP_MAX_DATAGRAM)
+        threading.Thread(target=self._rx, name=f"router-rx-{spec}", daemon=True).start()
+
+    def _sendto(self, data: bytes) -> None:
+        if self._dest is not None:
+            self._sock.sendto(data, self._dest)
+
+    def _rx(self) -> None:
+        splitter = FrameSplitter()
+        while not self._closed:
+            try:
+                data, addr = self._sock.recvfrom(65535)
+            except OSError:
+                if self._closed:
+                    return
+                continue
+            self._dest = addr
+            for frame in splitter.feed(data):
+                self.frames_in += 1
+                self._uplink(frame)
+
+    def forward(self, buf: bytes) -> None:
+        if self._dest is not None:
+            self.peer.submit(buf)
+
+    def close(self) -> None:
+        self._closed = True
+        self.peer.close()
+        self._sock.close()
+
+    def stats(self) -> dict[str, Any]:
+        return {"output": self.spec, "frames_in": self.frames_in, "peers": [self.peer.stats()]}
+
+
+class _TcpServerOutput:
+    """tcpin:addr:port -- accept any number of GCS connections, each with its own queue."""
+
+    def __init__(self, spec: str, uplink: Callable[[bytes], None], queue_size: int) -> None:
+        _, _, addr = spec.partition(":")
+        self.spec = spec
+        self._uplink = uplink
+        self._queue_size = queue_size
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(_parse_addr(addr))
+        self._server.listen(8)
+        self._peers: dict[_Peer, socket.socket] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self.frames_in = 0
+        threading.Thread(target=self._accept, name=f"router-accept-{spec}", daemon=True).start()
+
+    def _accept(self) -> None:
+        while not self._closed:
+            try:
+                conn, addr = self._server.accept()
+            except OSError:
+                if self._closed:
+                    return
+                continue
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn.settimeout(TCP_SEND_TIMEOUT_S)
+            peer = _Peer(f"{addr[0]}:{addr[1]}", conn.sendall, queue_size=self._queue_size, max_chunk=None)
+            with self._lock:
+                self._peers[peer] = conn
+            threading.Thread(target=self._rx, args=(peer, conn), name=f"router-rx-{peer.name}", daemon=True).start()
+
+    def _rx(self, peer: _Peer, conn: socket.socket) -> None:
+        splitter = FrameSplitter()
+        try:
+            while not (self._closed or peer.closed):
+                try:
+                    data = conn.recv(65536)
+                except socket.timeout:
+                    continue
+                if not data:
+                    break
+                for frame in splitter.feed(data):
+                    self.frames_in += 1
+                    self._uplink(frame)
+        except OSError:
+            pass
+        finally:
+            self._drop(peer)
+
+    def _drop(self, peer: _Peer) -> None:
+        with self._lock:
+            conn = self._peers.pop(peer, None)
+        peer.close()
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def forward(self, buf: bytes) -> None:
+        for peer in list(self._peers):
+            if peer.error is not None:
+                # send timed out / connection reset: disconnect, the GCS will reconnect
+                self._drop(peer)
+                continue
+            peer.submit(buf)
+
+    def close(self) -> None:
+        self._closed = True
+        self._server.close()
+        for peer in list(self._peers):
+            self._drop(peer)
+
+    def stats(self) -> dict[str, Any]:
+        return {"output": self.spec, "frames_in": self.frames_in, "peers": [p.stats() for p in list(self._peers)]}
+
+
+class MavlinkRouter:
+    """
+    Fans the vehicle link out to other GCSs (Mission Planner, QGC, MAVProxy) while the
+    web backend keeps owning the serial port.
+
+    forward() is called from the RX thread with the raw bytes of every received frame;
+    the same bytes object is queued to every endpoint without re-encoding or copying.
+    Frames the GCSs send back are re-framed and written to the link via `uplink`.
+    """
+
+    def __init__(self, outputs: list[str], uplink: Callable[[bytes], None], *, queue_size: int = DEFAULT_QUEUE_SIZE) -> None:
+        self.outputs_spec = list(outputs)
+        self._uplink = uplink
+        self._queue_size = queue_size
+        self._outputs: list[_UdpOutput | _TcpServerOutput] = []
+        self.errors: list[str] = []
+
+    def start(self) -> None:
+        for spec in self.outputs_spec:
+            try:
+                if spec.startswith(("udpin:", "udpout:", "udp:")):
+                    self._outputs.append(_UdpOutput(spec, self._uplink, self._queue_size))
+                elif spec.startswith("tcpin:"):
+                    self._outputs.append(_TcpServerOutput(spec, self._uplink, self._queue_size))
+                else:
+                    self.errors.append(f"{spec}: unsupported output (udpin:, udpout:, tcpin:)")
+            except (OSError, ValueError) as e:
+                self.errors.append(f"{spec}: {type(e).__name__}: {e}")
+
+    def stop(self) -> None:
+        for out in self._outputs:
+            out.close()
+        self._outputs = []
+
+    def forward(self, buf: bytes) -> None:
+        for out in self._outputs:
+            out.forward(buf)
+
+    def stats(self) -> dict[str, Any]:
+        return {"outputs": [o.stats() for o in self._outputs], "errors": list(self.errors)}
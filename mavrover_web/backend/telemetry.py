@@ -1,120 +1,325 @@
 from __future__ import annotations
 
+import math
 import time
+from collections import deque
 from dataclasses import dataclass, field
+from typing import Any, Callable
 
-from .data_model import BatteryModel, GPSModel, TelemetryModel
+from pydantic import BaseModel
 
+from .data_model import TelemetryModel
+from .history import TelemetryHistory
 
-@dataclass
-class TelemetryState:
-    data: TelemetryModel = field(default_factory=TelemetryModel)
+
+@dataclass(frozen=True)
+class TelemetrySnapshot:
+    """
+    Immutable published view of TelemetryState. Readers never take a lock:
+    they just read TelemetryState.snapshot, which the writer swaps atomically.
+    The dicts are shared between readers and must not be mutated.
+    """
+
+    version: int = 0
+    data: dict[str, Any] = field(default_factory=lambda: TelemetryModel().model_dump())
+    field_versions: dict[str, int] = field(default_factory=dict)
     last_heartbeat_ts: float | None = None
+    timestamp_ms: int | None = None
 
-    def to_model(self) -> TelemetryModel:
-        m = self.data.model_copy(deep=True)
+    def heartbeat_age_s(self) -> float | None:
         if self.last_heartbeat_ts is None:
-            m.last_heartbeat_age_s = None
-        else:
-            m.last_heartbeat_age_s = max(0.0, time.time() - self.last_heartbeat_ts)
+            return None
+        return max(0.0, time.time() - self.last_heartbeat_ts)
+
+    def to_model(self) -> TelemetryModel:
+        """Schema-validated pydantic view; only for edges that need it (exports, API)."""
+        m = TelemetryModel.model_validate(self.data)
+        m.timestamp_ms = self.timestamp_ms
+        m.last_heartbeat_age_s = self.heartbeat_age_s()
         return m
 
 
-def _append_limited(lst: list[str], msg: str, limit: int = 30) -> None:
-    lst.append(msg)
-    if len(lst) > limit:
-        del lst[: len(lst) - limit]
+# Max length of errors / warnings / statustext.
+LIST_LIMIT = 30
+
+
+class _Record:
+    """Plain slotted record mirroring a nested pydantic model (GPSModel, BatteryModel, ...)."""
+
+    __slots__ = ()
+
+    def __init__(self) -> None:
+        for name in self.__slots__:
+            setattr(self, name, None)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _record_type(model: type[BaseModel]) -> type[_Record]:
+    return type(f"{model.__name__}Record", (_Record,), {"__slots__": tuple(model.model_fields)})
+
 
+_GROUP_TYPES: dict[str, type[_Record]] = {}
+_LIST_FIELDS: set[str] = set()
+for _name, _f in TelemetryModel.model_fields.items():
+    if isinstance(_f.annotation, type) and issubclass(_f.annotation, BaseModel):
+        _GROUP_TYPES[_name] = _record_type(_f.annotation)
+    elif isinstance(_f.get_default(call_default_factory=True), list):
+        _LIST_FIELDS.add(_name)
 
-def handle_mavlink_message(state: TelemetryState, msg: object) -> None:
+
+class TelemetryStore:
+    """
+    Hot-path telemetry storage: plain slots instead of pydantic attribute machinery.
+    Same field names as TelemetryModel; nested models become _Record objects and the
+    bounded string lists become deque(maxlen=LIST_LIMIT).
+    """
+
+    __slots__ = tuple(TelemetryModel.model_fields)
+
+    def __init__(self) -> None:
+        for name, f in TelemetryModel.model_fields.items():
+            if name in _GROUP_TYPES:
+                setattr(self, name, _GROUP_TYPES[name]())
+            elif name in _LIST_FIELDS:
+                setattr(self, name, deque(maxlen=LIST_LIMIT))
+            else:
+                setattr(self, name, f.default)
+
+    def export(self, name: str) -> Any:
+        """JSON-ready copy of one top-level field (dict / list / scalar)."""
+        v = getattr(self, name)
+        if name in _GROUP_TYPES:
+            return v.as_dict()
+        if name in _LIST_FIELDS:
+            return list(v)
+        return v
+
+
+@dataclass
+class TelemetryState:
+    """
+    Single-writer telemetry store: only the MAVLink RX thread mutates it.
+    Other threads/tasks queue changes with submit(); everyone reads `snapshot`.
+    """
+
+    data: TelemetryStore = field(default_factory=TelemetryStore)
+    last_heartbeat_ts: float | None = None
+    # Monotonic change counter. Every top-level field remembers the version it was last
+    # changed at, so readers can build "what changed since version N" deltas.
+    # timestamp_ms / last_heartbeat_age_s are volatile and intentionally not tracked.
+    version: int = 0
+    field_versions: dict[str, int] = field(default_factory=dict)
+    snapshot: TelemetrySnapshot = field(default_factory=TelemetrySnapshot)
+    pending: deque[Callable[[TelemetryState], None]] = field(default_factory=deque)
+    # Called (from the writer thread) after a changed snapshot is published,
+    # e.g. ChangeNotifier.notify.
+    on_change: Callable[[], None] | None = None
+    # Optional ring-buffer history; receives every numeric sample, changed or not.
+    history: TelemetryHistory | None = None
+
+    def mark(self, *names: str) -> None:
+        self.version += 1
+        for name in names:
+            self.field_versions[name] = self.version
+
+    def set(self, name: str, value: Any) -> None:
+        if self.history is not None:
+            self.history.record(name, value)
+        if getattr(self.data, name) != value:
+            setattr(self.data, name, value)
+            self.mark(name)
+
+    def update(self, group: str, **values: Any) -> None:
+        """Update fields of a nested group (gps, battery, ...); the whole group is marked changed."""
+        if self.history is not None:
+            self.history.record_group(group, values)
+        obj = getattr(self.data, group)
+        changed = False
+        for k, v in values.items():
+            if getattr(obj, k) != v:
+                setattr(obj, k, v)
+                changed = True
+        if changed:
+            self.mark(group)
+
+    def append(self, name: str, line: str) -> None:
+        getattr(self.data, name).append(line)
+        self.mark(name)
+
+    def changed_since(self, version: int) -> list[str]:
+        return [name for name, v in self.field_versions.items() if v > version]
+
+    def submit(self, fn: Callable[[TelemetryState], None]) -> None:
+        """Queue a mutation from a non-writer thread; applied by the writer in apply_pending()."""
+        self.pending.append(fn)
+
+    def apply_pending(self) -> None:
+        while self.pending:
+            self.pending.popleft()(self)
+
+    def publish(self) -> None:
+        """Writer only: swap in a new immutable snapshot (plain reference assignment)."""
+        prev = self.snapshot
+        changed = prev.version != self.version
+        if changed:
+            # Copy-on-write: only fields changed since the previous snapshot are exported,
+            # everything else is shared with it.
+            data = dict(prev.data)
+            for name in self.changed_since(prev.version):
+                data[name] = self.data.export(name)
+            self.snapshot = TelemetrySnapshot(
+                version=self.version,
+                data=data,
+                field_versions=dict(self.field_versions),
+                last_heartbeat_ts=self.last_heartbeat_ts,
+                timestamp_ms=self.data.timestamp_ms,
+            )
+        elif (prev.timestamp_ms, prev.last_heartbeat_ts) != (self.data.timestamp_ms, self.last_heartbeat_ts):
+            self.snapshot = TelemetrySnapshot(
+                version=prev.version,
+                data=prev.data,
+                field_versions=prev.field_versions,
+                last_heartbeat_ts=self.last_heartbeat_ts,
+                timestamp_ms=self.data.timestamp_ms,
+            )
+        if changed and self.on_change is not None:
+            self.on_change()
+
+
+MessageHandler = Callable[[TelemetryState, Any], None]
+
+# MAVLink message type -> handler. Types without a handler are dropped immediately.
+MESSAGE_HANDLERS: dict[str, MessageHandler] = {}
+
+
+def register_handler(*mtypes: str) -> Callable[[MessageHandler], MessageHandler]:
+    """
+    Register a telemetry handler for one or more MAVLink message types:
+
+        @register_handler("RC_CHANNELS")
+        def _rc_channels(state, msg): ...
+
+    A later registration for the same type replaces the earlier one.
+    """
+
+    def deco(fn: MessageHandler) -> MessageHandler:
+        for mtype in mtypes:
+            MESSAGE_HANDLERS[mtype] = fn
+        return fn
+
+    return deco
+
+
+def handle_mavlink_message(state: TelemetryState, msg: Any) -> None:
     """
     Update telemetry state from a pymavlink message.
-    This function must be tolerant of missing fields.
+    Handlers must be tolerant of missing fields.
     """
-    mtype = getattr(msg, "get_type", lambda: None)()
+    try:
+        mtype = msg.get_type()
+    except AttributeError:
+        return
+    handler = MESSAGE_HANDLERS.get(mtype)
+    if handler is None:
+        return
     state.data.timestamp_ms = int(time.time() * 1000)
+    handler(state, msg)
 
-    if mtype == "BAD_DATA":
-        return
 
-    if mtype == "HEARTBEAT":
-        state.data.connected = True
-        state.last_heartbeat_ts = time.time()
-        base_mode = getattr(msg, "base_mode", 0)
-        # MAV_MODE_FLAG_SAFETY_ARMED = 128
-        state.data.armed = bool(base_mode & 128)
-        custom_mode = getattr(msg, "custom_mode", None)
-        # Mode string will be filled by mavlink layer when possible; keep placeholder here
-        if custom_mode is not None and (state.data.mode is None):
-            state.data.mode = str(custom_mode)
-        return
+@register_handler("HEARTBEAT")
+def _heartbeat(state: TelemetryState, msg: Any) -> None:
+    state.set("connected", True)
+    state.last_heartbeat_ts = time.time()
+    base_mode = getattr(msg, "base_mode", 0)
+    # MAV_MODE_FLAG_SAFETY_ARMED = 128
+    state.set("armed", bool(base_mode & 128))
+    custom_mode = getattr(msg, "custom_mode", None)
+    # Mode string will be filled by mavlink layer when possible; keep placeholder here
+    if custom_mode is not None and (state.data.mode is None):
+        state.set("mode", str(custom_mode))
 
-    if mtype == "SYS_STATUS":
-        batt_mv = getattr(msg, "voltage_battery", None)  # mV
-        batt_ma = getattr(msg, "current_battery", None)  # 10mA units, -1 unknown
-        remaining = getattr(msg, "battery_remaining", None)  # %
-        state.data.sensors_present = getattr(msg, "onboard_control_sensors_present", None)
-        state.data.sensors_enabled = getattr(msg, "onboard_control_sensors_enabled", None)
-        state.data.sensors_health = getattr(msg, "onboard_control_sensors_health", None)
-        b = state.data.battery if isinstance(state.data.battery, BatteryModel) else BatteryModel()
-        if isinstance(batt_mv, (int, float)) and batt_mv != 0:
-            b.voltage_v = float(batt_mv) / 1000.0
-        if isinstance(batt_ma, (int, float)) and batt_ma not in (-1, 0):
-            b.current_a = float(batt_ma) / 100.0
-        if isinstance(remaining, (int, float)) and remaining >= 0:
-            b.remaining_pct = float(remaining)
-        state.data.battery = b
-        return
 
-    if mtype == "GPS_RAW_INT":
-        lat = getattr(msg, "lat", None)  # 1e7
-        lon = getattr(msg, "lon", None)  # 1e7
-        alt = getattr(msg, "alt", None)  # mm
-        eph = getattr(msg, "eph", None)  # cm
-        sats = getattr(msg, "satellites_visible", None)
-        fix_type = getattr(msg, "fix_type", None)
-        g = state.data.gps if isinstance(state.data.gps, GPSModel) else GPSModel()
-        if isinstance(lat, (int, float)) and lat not in (0, 2147483647, -2147483648):
-            g.lat = float(lat) / 1e7
-        if isinstance(lon, (int, float)) and lon not in (0, 2147483647, -2147483648):
-            g.lon = float(lon) / 1e7
-        if isinstance(alt, (int, float)) and alt != 0:
-            g.alt_m = float(alt) / 1000.0
-        if isinstance(eph, (int, float)) and eph > 0:
-            g.hdop = float(eph) / 100.0
-        if isinstance(sats, (int, float)):
-            g.sats = int(sats)
-        if isinstance(fix_type, (int, float)):
-            g.fix_type = int(fix_type)
-        state.data.gps = g
-        return
+@register_handler("SYS_STATUS")
+def _sys_status(state: TelemetryState, msg: Any) -> None:
+    batt_mv = getattr(msg, "voltage_battery", None)  # mV
+    batt_ma = getattr(msg, "current_battery", None)  # 10mA units, -1 unknown
+    remaining = getattr(msg, "battery_remaining", None)  # %
+    state.set("sensors_present", getattr(msg, "onboard_control_sensors_present", None))
+    state.set("sensors_enabled", getattr(msg, "onboard_control_sensors_enabled", None))
+    state.set("sensors_health", getattr(msg, "onboard_control_sensors_health", None))
+    b: dict[str, Any] = {}
+    if isinstance(batt_mv, (int, float)) and batt_mv != 0:
+        b["voltage_v"] = float(batt_mv) / 1000.0
+    if isinstance(batt_ma, (int, float)) and batt_ma not in (-1, 0):
+        b["current_a"] = float(batt_ma) / 100.0
+    if isinstance(remaining, (int, float)) and remaining >= 0:
+        b["remaining_pct"] = float(remaining)
+    state.update("battery", **b)
 
-    if mtype == "VFR_HUD":
-        groundspeed = getattr(msg, "groundspeed", None)
-        heading = getattr(msg, "heading", None)
-        if isinstance(groundspeed, (int, float)):
-            state.data.groundspeed_m_s = float(groundspeed)
-        if isinstance(heading, (int, float)):
-            state.data.heading_deg = float(heading)
-        return
 
-    if mtype == "STATUSTEXT":
-        text = getattr(msg, "text", None)
-        severity = getattr(msg, "severity", None)
-        if text:
-            line = str(text).strip()
-            _append_limited(state.data.statustext, line)
-            if isinstance(severity, int) and severity <= 3:
-                _append_limited(state.data.errors, line)
-            elif isinstance(severity, int) and severity <= 5:
-                _append_limited(state.data.warnings, line)
-        return
+@register_handler("GPS_RAW_INT")
+def _gps_raw_int(state: TelemetryState, msg: Any) -> None:
+    lat = getattr(msg, "lat", None)  # 1e7
+    lon = getattr(msg, "lon", None)  # 1e7
+    alt = getattr(msg, "alt", None)  # mm
+    eph = getattr(msg, "eph", None)  # cm
+    sats = getattr(msg, "satellites_visible", None)
+    fix_type = getattr(msg, "fix_type", None)
+    g: dict[str, Any] = {}
+    if isinstance(lat, (int, float)) and lat not in (0, 2147483647, -2147483648):
+        g["lat"] = float(lat) / 1e7
+    if isinstance(lon, (int, float)) and lon not in (0, 2147483647, -2147483648):
+        g["lon"] = float(lon) / 1e7
+    if isinstance(alt, (int, float)) and alt != 0:
+        g["alt_m"] = float(alt) / 1000.0
+    if isinstance(eph, (int, float)) and eph > 0:
+        g["hdop"] = float(eph) / 100.0
+    if isinstance(sats, (int, float)):
+        g["sats"] = int(sats)
+    if isinstance(fix_type, (int, float)):
+        g["fix_type"] = int(fix_type)
+    state.update("gps", **g)
+
+
+@register_handler("VFR_HUD")
+def _vfr_hud(state: TelemetryState, msg: Any) -> None:
+    groundspeed = getattr(msg, "groundspeed", None)
+    heading = getattr(msg, "heading", None)
+    if isinstance(groundspeed, (int, float)):
+        state.set("groundspeed_m_s", float(groundspeed))
+    if isinstance(heading, (int, float)):
+        state.set("heading_deg", float(heading))
+
+
+@register_handler("ATTITUDE")
+def _attitude(state: TelemetryState, msg: Any) -> None:
+    a: dict[str, Any] = {}
+    for src, dst in (("roll", "roll_deg"), ("pitch", "pitch_deg"), ("yaw", "yaw_deg")):
+        v = getattr(msg, src, None)  # rad
+        if isinstance(v, (int, float)):
+            a[dst] = round(math.degrees(v), 2)
+    state.update("attitude", **a)
+
+
+@register_handler("STATUSTEXT")
+def _statustext(state: TelemetryState, msg: Any) -> None:
+    text = getattr(msg, "text", None)
+    severity = getattr(msg, "severity", None)
+    if text:
+        line = str(text).strip()
+        state.append("statustext", line)
+        if isinstance(severity, int) and severity <= 3:
+            state.append("errors", line)
+        elif isinstance(severity, int) and severity <= 5:
+            state.append("warnings", line)
 
-    if mtype == "EKF_STATUS_REPORT":
-        flags = getattr(msg, "flags", None)
-        if isinstance(flags, int):
-            # If EKF flags indicate unhealthy, flag as warning (simple heuristic)
-            if flags == 0:
-                _append_limited(state.data.warnings, "EKF: no flags set (check EKF health)")
-        return
 
+@register_handler("EKF_STATUS_REPORT")
+def _ekf_status_report(state: TelemetryState, msg: Any) -> None:
+    flags = getattr(msg, "flags", None)
+    if isinstance(flags, int):
+        # If EKF flags indicate unhealthy, flag as warning (simple heuristic)
+        if flags == 0:
+            state.append("warnings", "EKF: no flags set (check EKF health)")
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import os
+import queue
+import re
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from .logstore import INDEX_SUFFIX, TlogIndex, frame_info
+
+# tlog record = 8-byte big-endian microseconds since epoch + raw MAVLink frame
+# (the format Mission Planner / MAVProxy / pymavlink read).
+_TS = struct.Struct(">Q")
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Older files of the same recorder are deleted on rotation beyond this total (SD card).
+DEFAULT_MAX_TOTAL_BYTES = 1024 * 1024 * 1024
+DEFAULT_QUEUE_SIZE = 20_000
+DEFAULT_FSYNC_INTERVAL_S = 2.0
+
+
+class TlogRecorder:
+    """
+    Records raw MAVLink frames into rotating .tlog files.
+
+    submit() is called from the RX thread and never blocks: frames go into a bounded
+    queue and are dropped (and counted) when the writer falls behind. A dedicated
+    writer thread drains the queue in batches and fsyncs at most every fsync_interval_s.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        prefix: str = "mavrover",
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_total_bytes: int | None = DEFAULT_MAX_TOTAL_BYTES,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        fsync_interval_s: float = DEFAULT_FSYNC_INTERVAL_S,
+    ) -> None:
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_total_bytes = max_total_bytes
+        self._name_re = re.compile(rf"^\d{{4}}-\d\d-\d\d_\d\d-\d\d-\d\d_{re.escape(prefix)}(\.\d+)?\.tlog$")
+        self.fsync_interval_s = fsync_interval_s
+        self._q: queue.Queue[tuple[float, bytes]] = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._file: BinaryIO | None = None
+        self._path: Path | None = None
+        self._file_bytes = 0
+        self._index: TlogIndex | None = None
+        # counters (written by their owning thread only)
+        self.frames_written = 0
+        self.frames_dropped = 0  # queue full (RX thread)
+        self.frames_failed = 0  # write errors (writer thread)
+        self.bytes_written = 0
+        self.files_opened = 0
+        self.files_deleted = 0
+        self.last_error: str | None = None
+
+    # --- RX thread side ---
+
+    def submit(self, buf: bytes, ts: float | None = None) -> bool:
+        try:
+            self._q.put_nowait((time.time() if ts is None else ts, buf))
+            return True
+        except queue.Full:
+            self.frames_dropped += 1
+            return False
+
+    # --- lifecycle ---
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        t = threading.Thread(target=self._run, name="tlog-writer", daemon=True)
+        self._thread = t
+        t.start()
+
+    def stop(self, timeout_s: float = 5.0) -> None:
+        self._stop.set()
+        t = self._thread
+        if t is not None:
+            t.join(timeout_s)
+        self._thread = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "recording": self._thread is not None,
+            "file": None if self._path is None else self._path.name,
+            "frames_written": self.frames_written,
+            "frames_dropped": self.frames_dropped,
+            "frames_failed": self.frames_failed,
+            "bytes_written": self.bytes_written,
+            "files_opened": self.files_opened,
+            "files_deleted": self.files_deleted,
+            "queue": self._q.qsize(),
+            "error": self.last_error,
+        }
+
+    # --- writer thread ---
+
+    def _open_new(self) -> None:
+        self._close()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y-%m-%d_%H-%M-%S")
+        path = self.directory / f"{stamp}_{self.prefix}.tlog"
+        n = 1
+        while path.exists():
+            # "." cannot occur in a vehicle id, so "mavrover.1" never looks like vehicle 1's "mavrover_1".
+            path = self.directory / f"{stamp}_{self.prefix}.{n}.tlog"
+            n += 1
+        self._file = open(path, "ab", buffering=256 * 1024)
+        self._path = path
+        self._file_bytes = 0
+        self._index = TlogIndex()
+        self.files_opened += 1
+        self._prune()
+
+    def _prune(self) -> None:
+        # Oldest first (file names start with the timestamp); the open file is never removed.
+        if not self.max_total_bytes:
+            return
+        files = sorted(p for p in self.directory.iterdir() if self._name_re.match(p.name) and p != self._path)
+        sizes = {}
+        for p in files:
+            try:
+                sizes[p] = p.stat().st_size
+            except OSError:
+                pass
+        total = sum(sizes.values())
+        for p, size in sizes.items():
+            if total <= self.max_total_bytes:
+                break
+            try:
+                p.unlink()
+            except OSError as e:
+                self.last_error = f"prune: {type(e).__name__}: {e}"
+                continue
+            try:
+                p.with_name(p.name + INDEX_SUFFIX).unlink()
+            except OSError:
+                pass
+            total -= size
+            self.files_deleted += 1
+
+    def _sync(self) -> None:
+        if self._file is None:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _close(self) -> None:
+        f = self._file
+        if f is None:
+            return
+        try:
+            self._sync()
+        finally:
+            f.close()
+            self._file = None
+            self._save_index()
+
+    def _save_index(self) -> None:
+        # Sidecar written once the file is final so LogStore never has to rescan it.
+        idx, path = self._index, self._path
+        self._index = None
+        if idx is None or path is None:
+            return
+        try:
+            idx.mtime_ns = path.stat().st_mtime_ns
+            idx.save(path.with_name(path.name + INDEX_SUFFIX))
+        except OSError as e:
+            self.last_error = f"index: {type(e).__name__}: {e}"
+
+    def _write_batch(self, batch: list[tuple[float, bytes]]) -> None:
+        if self._file is None or self._file_bytes >= self.max_bytes:
+            self._open_new()
+        assert self._file is not None
+        idx = self._index
+        offset = self._file_bytes
+        records = []
+        for ts, buf in batch:
+            ts_us = int(ts * 1_000_000)
+            info = frame_info(buf)
+            if idx is not None and info is not None:
+                idx.add(offset, ts_us, info[1], 8 + len(buf))
+            records.append(_TS.pack(ts_us) + buf)
+            offset += 8 + len(buf)
+        chunk = b"".join(records)
+        self._file.write(chunk)
+        self._file_bytes += len(chunk)
+        self.bytes_written += len(chunk)
+        self.frames_written += len(batch)
+
+    def _run(self) -> None:
+        last_sync = time.monotonic()
+        try:
+            while not (self._stop.is_set() and self._q.empty()):
+                try:
+                    batch = [self._q.get(timeout=0.5)]
+                except queue.Empty:
+                    batch = []
+                while len(batch) < 4096:
+                    try:
+                        batch.append(self._q.get_nowait())
+                    except queue.Empty:
+                        break
+                try:
+                    if batch:
+                        self._write_batch(batch)
+                    now = time.monotonic()
+                    if now - last_sync >= self.fsync_interval_s:
+                        self._sync()
+                        last_sync = now
+                except OSError as e:
+                    # Disk full / removed: count the batch as dropped and retry on a new file.
+                    self.frames_failed += len(batch)
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    try:
+                        self._close()
+                    except OSError:
+                        self._file = None
+                    time.sleep(1.0)
+        finally:
+            try:
+                self._close()
+            except OSError:
+                pass
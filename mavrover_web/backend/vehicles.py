@@ -0,0 +1,468 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterator
+
+from .acks import CommandAckTracker, is_our_ack
+from .aio_transport import supports_async
+from .broadcast import ChangeNotifier, TelemetryBroadcaster
+from .commands import CommandLane, CommandSender
+from .history import DEFAULT_CAPACITY as DEFAULT_HISTORY_CAPACITY
+from .history import TelemetryHistory
+from .mavlink import MavlinkClient, MavlinkConfig, MavlinkError
+from .rc_stream import RcStream
+from .router import MavlinkRouter
+from .telemetry import TelemetryState, handle_mavlink_message
+from .tlog import TlogRecorder
+
+# Id of the vehicle built from the legacy single-link config (top-level serial_port).
+DEFAULT_VEHICLE_ID = "default"
+# Config keys that need the MAVLink link reopened when they change.
+LINK_KEYS = ("serial_port", "baudrate", "sysid", "transport")
+
+VEHICLE_ID_RE = re.compile(r"^[\w\-]+$")
+
+
+def vehicle_configs(cfg: dict[str, Any]) -> list[dict[str, Any]]:
+    """
+    The "vehicles" list from config.json, e.g.
+        "vehicles": [{"id": "rover1", "serial_port": "/dev/ttyUSB0", "baudrate": 57600},
+                     {"id": "copter", "serial_port": "udpin:0.0.0.0:14551", "sysid": 2}]
+    Without it the top-level serial_port/baudrate/sysid/transport/outputs describe a single
+    vehicle, as before.
+    """
+    entries = cfg.get("vehicles")
+    if not entries:
+        return [
+            {
+                "id": DEFAULT_VEHICLE_ID,
+                "serial_port": cfg.get("serial_port"),
+                "baudrate": cfg.get("baudrate"),
+                "sysid": cfg.get("sysid"),
+                "transport": cfg.get("transport"),
+                "outputs": cfg.get("outputs"),
+            }
+        ]
+    out = []
+    for i, entry in enumerate(entries):
+        vid = str(entry.get("id") or f"v{i + 1}")
+        if not VEHICLE_ID_RE.match(vid):
+            raise ValueError(f"Bad vehicle id in config.json: {vid!r}")
+        out.append({**entry, "id": vid})
+    return out
+
+
+class Vehicle:
+    """
+    One MAVLink link and everything hanging off it: RX thread (the only writer of
+    `telemetry`), notifier, broadcaster, history, tlog recorder and router. Vehicles share
+    nothing on the hot path, so a slow or dead link only stalls its own clients.
+    """
+
+    def __init__(self, vid: str, cfg: dict[str, Any]) -> None:
+        self.id = vid
+        self.cfg = cfg
+        self.name = str(cfg.get("name") or vid)
+        # Configured sysid => only that system's messages are accepted and commands target it.
+        # Otherwise the sysid is learned from the first HEARTBEAT (for lookup by sysid).
+        self.sysid_filter: int | None = int(cfg["sysid"]) if cfg.get("sysid") else None
+        self.sysid: int | None = self.sysid_filter
+        # Written only by the RX thread; async code reads telemetry.snapshot (no locking).
+        self.telemetry = TelemetryState()
+        # Guards swapping `mav` only; never held while handling telemetry.
+        self.lock = threading.Lock()
+        self.mav: MavlinkClient | None = None
+        self.thread: threading.Thread | None = None
+        self.task: asyncio.Task | None = None
+        self.stop_event = threading.Event()
+        self.recorder: TlogRecorder | None = None
+        # "outputs": ["udpout:127.0.0.1:14550", "tcpin:0.0.0.0:5760"] => forward the link to other GCSs
+        self.router: MavlinkRouter | None = None
+        self.uplink_frames = 0
+        self.uplink_dropped = 0
+        # All command sends for this vehicle: one TX worker with priority lanes.
+        self.commands = CommandSender(vid)
+        self.acks = CommandAckTracker()
+        self.rc = RcStream(self._send_rc)
+        self.notifier = ChangeNotifier()
+        self.telemetry.on_change = self.notifier.notify
+        self.broadcaster = TelemetryBroadcaster(self.telemetry, self.notifier)
+
+    @property
+    def serial_port(self) -> str:
+        return str(self.cfg.get("serial_port") or "").strip()
+
+    def start(
+        self,
+        *,
+        history_capacity: int = DEFAULT_HISTORY_CAPACITY,
+        tlog_dir: Path | None = None,
+        tlog_max_bytes: int | None = None,
+        tlog_max_total_bytes: int | None = None,
+        rc_rate_hz: float | None = None,
+        rc_timeout_s: float | None = None,
+    ) -> None:
+        self.rc.configure(rate_hz=rc_rate_hz, timeout_s=rc_timeout_s)
+        if self.telemetry.history is None:
+            self.telemetry.history = TelemetryHistory(history_capacity)
+        if tlog_dir is not None and self.recorder is None:
+            prefix = "mavrover" if self.id == DEFAULT_VEHICLE_ID else f"mavrover_{self.id}"
+            kwargs: dict[str, Any] = {} if tlog_max_bytes is None else {"max_bytes": tlog_max_bytes}
+            if tlog_max_total_bytes is not None:
+                kwargs["max_total_bytes"] = tlog_max_total_bytes
+            self.recorder = TlogRecorder(tlog_dir, prefix=prefix, **kwargs)
+            self.recorder.start()
+        self._start_router()
+        self._start_link()
+
+    def _start_router(self) -> None:
+        outputs = [str(o) for o in (self.cfg.get("outputs") or [])]
+        if outputs and self.router is None:
+            self.router = MavlinkRouter(outputs, self._uplink)
+            self.router.start()
+
+    def _start_link(self) -> None:
+        # A fresh stop event per link: a retired RX thread keeps seeing its own one set.
+        stop = threading.Event()
+        self.stop_event = stop
+        if self._use_async():
+            self.task = asyncio.get_running_loop().create_task(self.aio_rx_loop(stop), name=f"mavlink-rx-{self.id}")
+            return
+        t = threading.Thread(target=self.rx_loop, args=(stop,), name=f"mavlink-rx-{self.id}", daemon=True)
+        self.thread = t
+        t.start()
+
+    def _use_async(self) -> bool:
+        # "transport": "thread" forces the pymavlink thread; replay:/tcp:/COM ports always use it.
+        if str(self.cfg.get("transport") or "auto") == "thread" or not supports_async(self.serial_port):
+            return False
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return True
+
+    def stop(self) -> None:
+        if self.recorder is not None:
+            self.recorder.stop()
+            self.recorder = None
+        if self.router is not None:
+            self.router.stop()
+            self.router = None
+        self.rc.stop()
+        self._stop_link()
+        self.commands.stop()
+
+    def _stop_link(self) -> tuple[threading.Thread | None, asyncio.Task | None]:
+        self.stop_event.set()
+        thread, task = self.thread, self.task
+        self.thread = None
+        self.task = None
+        if task is not None:
+            task.cancel()
+        with self.lock:
+            mav = self.mav
+            self.mav = None
+        if mav is not None:
+            try:
+                mav.close()
+            except Exception:
+                pass
+        return thread, task
+
+    async def reconfigure(self, cfg: dict[str, Any]) -> bool:
+        """
+        Apply a changed config entry. Link settings (serial_port, baudrate, sysid, transport)
+        reconnect the link and `outputs` restarts the router, without touching telemetry,
+        history or the tlog. Returns True if the link was restarted.
+        """
+        old, self.cfg = self.cfg, cfg
+        self.name = str(cfg.get("name") or self.id)
+        if old.get("outputs") != cfg.get("outputs"):
+            if self.router is not None:
+                self.router.stop()
+                self.router = None
+            self._start_router()
+        if all(old.get(k) == cfg.get(k) for k in LINK_KEYS):
+            return False
+        self.rc.stop()
+        thread, task = self._stop_link()
+        # Wait for the old RX side to finish: telemetry must keep a single writer.
+        if task is not None:
+            await asyncio.wait([task])
+        if thread is not None:
+            await asyncio.to_thread(thread.join, 5.0)
+        self.sysid_filter = int(cfg["sysid"]) if cfg.get("sysid") else None
+        self.sysid = self.sysid_filter
+        port, baud = self.serial_port, cfg.get("baudrate")
+
+        def relinked(t: TelemetryState) -> None:
+            t.set("connected", False)
+            t.set("armed", None)
+            t.append("warnings", f"MAVLink link reconfigured: {port or '-'} @ {baud}")
+
+        self.telemetry.submit(relinked)
+        self._start_link()
+        return True
+
+    def _send_rc(self, steering_pwm: int | None, throttle_pwm: int | None) -> asyncio.Future:
+        # Same lane and coalescing key as rc_override commands: only the newest value waits.
+        mav = self.mav
+        if mav is None:
+            raise MavlinkError("Not connected")
+        return self.commands.submit(
+            CommandLane.RC,
+            functools.partial(mav.rc_override, steering_pwm=steering_pwm, throttle_pwm=throttle_pwm),
+            inline=mav.is_async,
+            key="rc_override",
+        )
+
+    def _uplink(self, frame: bytes) -> None:
+        # Router threads: frames from other GCSs go to the vehicle unchanged.
+        mav = self.mav
+        if mav is None:
+            self.uplink_dropped += 1
+            return
+        try:
+            mav.write_raw(frame)
+            self.uplink_frames += 1
+        except (MavlinkError, OSError):
+            self.uplink_dropped += 1
+
+    def router_stats(self) -> dict[str, Any] | None:
+        if self.router is None:
+            return None
+        return {**self.router.stats(), "uplink_frames": self.uplink_frames, "uplink_dropped": self.uplink_dropped}
+
+    def info(self) -> dict[str, Any]:
+        snap = self.telemetry.snapshot
+        return {
+            "id": self.id,
+            "name": self.name,
+            "sysid": self.sysid,
+            "serial_port": self.serial_port,
+            "connected": snap.data["connected"],
+            "armed": snap.data["armed"],
+            "mode": snap.data["mode"],
+            "last_heartbeat_age_s": snap.heartbeat_age_s(),
+        }
+
+    def _process_batch(self, client: MavlinkClient, batch: list) -> None:
+        # Runs on whichever side owns the link (RX thread or event loop); ends with publish().
+        tel = self.telemetry
+        tel.apply_pending()
+        # Replayed logs are not recorded again.
+        recorder = None if client.is_replay else self.recorder
+        router = self.router
+        for msg in batch:
+            if recorder is not None or router is not None:
+                # One bytes object per frame, shared by the recorder and every output.
+                raw = _raw_frame(msg)
+                if raw is not None:
+                    if recorder is not None:
+                        recorder.submit(raw, getattr(msg, "_timestamp", None))
+                    if router is not None:
+                        router.forward(raw)
+            if self.sysid_filter is not None and _src_system(msg) != self.sysid_filter:
+                continue
+            handle_mavlink_message(tel, msg)
+            mtype = getattr(msg, "get_type", lambda: None)()
+            if mtype == "COMMAND_ACK":
+                # ACKs addressed to other GCSs behind the router are theirs, not ours.
+                if is_our_ack(msg):
+                    self.acks.on_ack(msg)
+            elif mtype == "HEARTBEAT":
+                if self.sysid is None:
+                    self.sysid = _src_system(msg)
+                mode_str = client.mode_string_from_heartbeat(msg)
+                if mode_str:
+                    tel.set("mode", mode_str)
+        tel.publish()
+
+    def _link_lost(self, client: MavlinkClient) -> None:
+        tel = self.telemetry
+        tel.set("connected", False)
+        tel.set("armed", None)
+        tel.publish()
+        # Best-effort close
+        try:
+            client.close()
+        except Exception:
+            pass
+        with self.lock:
+            if self.mav is client:
+                self.mav = None
+
+    def _reconnect_warning(self, e: BaseException) -> None:
+        # Keep a small trace in warnings
+        tel = self.telemetry
+        tel.apply_pending()
+        tel.append("warnings", f"MAVLink reconnect: {type(e).__name__}: {e}")
+        tel.publish()
+
+    def _client(self, port: str) -> MavlinkClient:
+        baudrate = int(self.cfg.get("baudrate") or 115200)
+        return MavlinkClient(MavlinkConfig(serial_port=port, baudrate=baudrate, target_system=self.sysid_filter))
+
+    def rx_loop(self, stop: threading.Event) -> None:
+        # This thread is the only writer of self.telemetry; every iteration ends with publish().
+        tel = self.telemetry
+        backoff_s = 1.0
+        while not stop.is_set():
+            port = self.serial_port
+            if not port:
+                tel.apply_pending()
+                tel.publish()
+                time.sleep(0.5)
+                continue
+
+            client = self._client(port)
+            try:
+                client.connect()
+                # connect() can outlast reconfigure()'s join: a retired thread must not
+                # install its client or touch telemetry. Checked under the lock that
+                # _stop_link takes after setting `stop`, so either side closes the client.
+                with self.lock:
+                    retired = stop.is_set()
+                    if not retired:
+                        self.mav = client
+                if retired:
+                    client.close()
+                    return
+                tel.set("connected", True)
+                tel.publish()
+                backoff_s = 1.0
+
+                while not stop.is_set():
+                    # Drain everything already parsed, publish one snapshot per batch.
+                    self._process_batch(client, client.recv_batch(timeout_s=1.0))
+            except Exception as e:
+                if stop.is_set():
+                    return  # closed by _stop_link; a newer link may own telemetry now
+                self._link_lost(client)
+                # Backoff before reconnect
+                stop.wait(min(10.0, backoff_s))
+                backoff_s = min(10.0, backoff_s * 1.8)
+                self._reconnect_warning(e)
+
+    async def aio_rx_loop(self, stop: threading.Event) -> None:
+        # Event-loop twin of rx_loop: frames are parsed in reader/datagram callbacks on the
+        # loop, which is then the only writer of self.telemetry.
+        tel = self.telemetry
+        backoff_s = 1.0
+        while not stop.is_set():
+            client = self._client(self.serial_port)
+
+            def on_batch(batch: list, client: MavlinkClient = client) -> None:
+                client.rx_stats.record(len(batch))
+                self._process_batch(client, batch)
+
+            try:
+                await client.connect_async(on_batch)
+                with self.lock:
+                    retired = stop.is_set()
+                    if not retired:
+                        self.mav = client
+                if retired:
+                    client.close()
+                    return
+                tel.set("connected", True)
+                tel.publish()
+                backoff_s = 1.0
+
+                conn = client.master
+                while not stop.is_set():
+                    try:
+                        await asyncio.wait_for(conn.closed.wait(), 1.0)
+                    except asyncio.TimeoutError:
+                        # Quiet link: still apply queued updates and refresh heartbeat age.
+                        self._process_batch(client, [])
+                        continue
+                    if stop.is_set():
+                        return
+                    raise conn.error or MavlinkError("Link closed")
+            except Exception as e:
+                self._link_lost(client)
+                await asyncio.sleep(min(10.0, backoff_s))
+                backoff_s = min(10.0, backoff_s * 1.8)
+                self._reconnect_warning(e)
+
+
+def _raw_frame(msg: Any) -> bytes | None:
+    try:
+        if msg.get_type() == "BAD_DATA":
+            return None
+        buf = msg.get_msgbuf()
+    except Exception:
+        return None
+    return bytes(buf) if buf else None
+
+
+def _src_system(msg: Any) -> int | None:
+    try:
+        return int(msg.get_srcSystem())
+    except Exception:
+        return None
+
+
+class VehicleRegistry:
+    """
+    All configured vehicles, keyed by link id. Built once at startup; lookups
+    (by id, or by MAVLink sysid) are plain dict reads and need no locking.
+    """
+
+    def __init__(self) -> None:
+        self._vehicles: dict[str, Vehicle] = {}
+        self.default_id: str | None = None
+
+    def configure(self, cfg: dict[str, Any]) -> None:
+        self._vehicles = {}
+        for entry in vehicle_configs(cfg):
+            vid = entry["id"]
+            if vid in self._vehicles:
+                raise ValueError(f"Duplicate vehicle id in config.json: {vid!r}")
+            self._vehicles[vid] = Vehicle(vid, entry)
+        self.default_id = next(iter(self._vehicles), None)
+
+    def __iter__(self) -> Iterator[Vehicle]:
+        return iter(list(self._vehicles.values()))
+
+    def __len__(self) -> int:
+        return len(self._vehicles)
+
+    def get(self, key: str | None = None) -> Vehicle | None:
+        """Vehicle by id or by sysid ("2"); None/"" => the first configured vehicle."""
+        key = (key or "").strip()
+        if not key:
+            return self._vehicles.get(self.default_id or "")
+        v = self._vehicles.get(key)
+        if v is not None:
+            return v
+        if key.isdigit():
+            sysid = int(key)
+            for v in self._vehicles.values():
+                if v.sysid == sysid:
+                    return v
+        return None
+
+    def start(self, **kwargs: Any) -> None:
+        for v in self:
+            v.start(**kwargs)
+
+    async def reconfigure(self, cfg: dict[str, Any]) -> list[str]:
+        """Apply changed per-vehicle settings; adding or removing vehicles still needs a restart."""
+        relinked = []
+        for entry in vehicle_configs(cfg):
+            v = self._vehicles.get(entry["id"])
+            if v is not None and await v.reconfigure(entry):
+                relinked.append(v.id)
+        return relinked
+
+    def stop(self) -> None:
+        for v in self:
+            v.stop()
@@ -0,0 +1,575 @@
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import io
+import multiprocessing
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable
+
+USER_AGENT = "mavrover_web/1.0"
+
+DEFAULT_PROBE_INTERVAL_S = 10.0
+DEFAULT_PROBE_TIMEOUT_S = 2.0
+
+# Relay: keep the upstream open this long after the last viewer left (page reloads).
+DEFAULT_RELAY_IDLE_S = 10.0
+# A camera frame bigger than this is treated as a broken stream.
+MAX_FRAME_BYTES = 4 * 1024 * 1024
+RELAY_BOUNDARY = "mavroverframe"
+
+# Adaptive viewers: share of each viewer's link time video may take; the rest is left for
+# telemetry and control. Below min fps a viewer steps down to a smaller re-encoded frame.
+DEFAULT_VIDEO_DUTY = 0.5
+DEFAULT_VIDEO_MIN_FPS = 5.0
+# (downscale divisor, JPEG quality); level 0 is the camera frame untouched.
+SCALE_LEVELS = ((1, 0), (2, 70), (4, 60))
+# Telemetry WS sends slower than this (EWMA) mean the viewer's link is congested.
+WS_CONGESTED_S = 0.05
+
+
+class HttpError(Exception):
+    pass
+
+
+@dataclass
+class HttpResponse:
+    status: int
+    reason: str
+    headers: dict[str, str]  # lower-case names
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get("content-type", "")
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+async def http_get(url: str, timeout_s: float, *, limit: int = 64 * 1024) -> HttpResponse:
+    """
+    Minimal asyncio HTTP/1.0 GET: connects, sends the request and reads the status line
+    and headers; the body is left on `reader`. Enough for the camera's MJPEG and JPEG
+    endpoints without pulling in an HTTP client dependency.
+    """
+    u = urllib.parse.urlsplit(url)
+    if u.scheme not in ("http", "https") or not u.hostname:
+        raise HttpError(f"Unsupported URL: {url!r}")
+    port = u.port or (443 if u.scheme == "https" else 80)
+    path = u.path or "/"
+    if u.query:
+        path += "?" + u.query
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(u.hostname, port, ssl=u.scheme == "https", limit=limit), timeout_s
+    )
+    try:
+        host = u.hostname if u.port is None else f"{u.hostname}:{u.port}"
+        writer.write(
+            f"GET {path} HTTP/1.0\r\nHost: {host}\r\nUser-Agent: {USER_AGENT}\r\nAccept: */*\r\n\r\n".encode("latin-1")
+        )
+        await writer.drain()
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout_s)
+    except BaseException:
+        writer.close()
+        raise
+    lines = head.decode("latin-1").split("\r\n")
+    parts = lines[0].split(" ", 2)
+    if len(parts) < 2 or not parts[1].isdigit():
+        writer.close()
+        raise HttpError(f"Bad status line: {lines[0]!r}")
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return HttpResponse(int(parts[1]), parts[2] if len(parts) > 2 else "", headers, reader, writer)
+
+
+async def probe_video_url(video_url: str, timeout_s: float = DEFAULT_PROBE_TIMEOUT_S) -> dict[str, Any]:
+    video_url = (video_url or "").strip()
+    if not video_url:
+        return {"configured": False, "ok": False, "error": "video_url is empty"}
+    try:
+        resp = await http_get(video_url, timeout_s)
+        try:
+            if resp.status >= 400:
+                return {"configured": True, "ok": False, "error": f"HTTP {resp.status} {resp.reason}"}
+            # MJPEG stream is infinite; just read a small chunk and close.
+            await asyncio.wait_for(resp.reader.read(256), timeout_s)
+        finally:
+            resp.close()
+        return {"configured": True, "ok": True, "content_type": resp.content_type}
+    except asyncio.TimeoutError:
+        return {"configured": True, "ok": False, "error": f"Timeout after {timeout_s:g} s"}
+    except Exception as e:
+        return {"configured": True, "ok": False, "error": f"{type(e).__name__}: {e}"}
+
+
+@dataclass(frozen=True)
+class Frame:
+    seq: int
+    ts: float  # time.monotonic() when the frame was complete
+    data: bytes  # one JPEG; shared by every subscriber, never copied
+
+    def part_header(self) -> bytes:
+        return (
+            f"--{RELAY_BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(self.data)}\r\n\r\n"
+        ).encode("ascii")
+
+
+def _boundary(content_type: str) -> bytes | None:
+    for param in content_type.split(";")[1:]:
+        name, _, value = param.strip().partition("=")
+        if name.lower() == "boundary" and value:
+            value = value.strip('"')
+            return value.encode("latin-1") if value.startswith("--") else b"--" + value.encode("latin-1")
+    return None
+
+
+async def iter_mjpeg(reader: asyncio.StreamReader, boundary: bytes, timeout_s: float) -> AsyncIterator[bytes]:
+    """
+    JPEG payloads of a multipart/x-mixed-replace body. Uses Content-Length when the part
+    has one (ESP32-CAM does) and otherwise scans for the next boundary.
+    """
+    delim = b"\r\n" + boundary
+    # Skip the preamble up to the first boundary line.
+    await asyncio.wait_for(reader.readuntil(boundary), timeout_s)
+    while True:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout_s)
+        length = None
+        for line in head.split(b"\r\n"):
+            name, sep, value = line.partition(b":")
+            if sep and name.strip().lower() == b"content-length":
+                length = int(value.strip())
+        if length is not None:
+            if length > MAX_FRAME_BYTES:
+                raise HttpError(f"MJPEG part too large: {length} bytes")
+            data = await asyncio.wait_for(reader.readexactly(length), timeout_s)
+            await asyncio.wait_for(reader.readuntil(boundary), timeout_s)
+        else:
+            data = (await asyncio.wait_for(reader.readuntil(delim), timeout_s))[: -len(delim)]
+        yield data
+
+
+def _reencode(data: bytes, divisor: int, quality: int) -> bytes:
+    # Runs in a worker process. draft() lets libjpeg decode at 1/2, 1/4 scale directly.
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(data))
+    size = (max(1, img.width // divisor), max(1, img.height // divisor))
+    img.draft("RGB", size)
+    if img.size != size:
+        img = img.resize(size)
+    out = io.BytesIO()
+    img.convert("RGB").save(out, "JPEG", quality=quality)
+    return out.getvalue()
+
+
+class JpegScaler:
+    """
+    Downscaled copies of relay frames, encoded in a process pool (Pillow, if installed).
+    One encode per (frame, level) however many viewers want it.
+    """
+
+    def __init__(self, *, enabled: bool = True, workers: int = 1) -> None:
+        self.available = enabled and importlib.util.find_spec("PIL") is not None
+        self.workers = workers
+        self._pool: ProcessPoolExecutor | None = None
+        self._cache: dict[int, tuple[int, asyncio.Future]] = {}  # level -> (frame seq, encode)
+        self.encoded = 0
+        self.failed = 0
+
+    @property
+    def max_level(self) -> int:
+        return len(SCALE_LEVELS) - 1 if self.available else 0
+
+    async def scaled(self, frame: Frame, level: int) -> Frame:
+        if level <= 0 or not self.available:
+            return frame
+        cached = self._cache.get(level)
+        if cached is None or cached[0] != frame.seq:
+            if self._pool is None:
+                # Never fork: this process runs threads (RX, tlog writer, router), and a forked
+                # child can inherit one of their locks held.
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(method))
+            divisor, quality = SCALE_LEVELS[level]
+            fut = asyncio.get_running_loop().run_in_executor(self._pool, _reencode, frame.data, divisor, quality)
+            cached = (frame.seq, fut)
+            self._cache[level] = cached
+            fut.add_done_callback(self._count)
+        try:
+            data = await asyncio.shield(cached[1])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            return frame  # not a JPEG Pillow can read: pass it through
+        return Frame(frame.seq, frame.ts, data)
+
+    def _count(self, fut: asyncio.Future) -> None:
+        if fut.cancelled() or fut.exception() is not None:
+            self.failed += 1
+        else:
+            self.encoded += 1
+
+    def stop(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        self._cache.clear()
+
+
+class LinkMonitor:
+    """Per-client-host EWMA of telemetry WebSocket send time, fed by /ws."""
+
+    STALE_S = 5.0
+
+    def __init__(self) -> None:
+        self._send_s: dict[str, tuple[float, float]] = {}  # host -> (ewma, last update)
+
+    def record(self, host: str, seconds: float) -> None:
+        prev = self._send_s.get(host)
+        ewma = seconds if prev is None else prev[0] * 0.8 + seconds * 0.2
+        self._send_s[host] = (ewma, time.monotonic())
+
+    def congested(self, host: str) -> bool:
+        entry = self._send_s.get(host)
+        if entry is None or time.monotonic() - entry[1] > self.STALE_S:
+            return False
+        return entry[0] > WS_CONGESTED_S
+
+
+class ViewerPacer:
+    """
+    Frame skipping and size choice for one viewer, from how long its frames take to send.
+
+    A frame that took t seconds to hand to the transport (which blocks once the socket
+    backs up) holds the next one back for t / duty, so video uses at most `duty` of the
+    viewer's link time. When that caps the viewer below min_fps it steps down a scale
+    level. Sends that don't block say nothing about spare capacity, so going back up is a
+    probe: after UP_AFTER_S without pressure, and undone by the next backlog.
+    """
+
+    DWELL_S = 3.0  # min time between level changes
+    UP_AFTER_S = 20.0
+
+    def __init__(
+        self,
+        *,
+        duty: float = DEFAULT_VIDEO_DUTY,
+        min_fps: float = DEFAULT_VIDEO_MIN_FPS,
+        max_fps: float | None = None,
+        max_level: int = 0,
+        congested: Callable[[], bool] | None = None,
+    ) -> None:
+        self.duty = duty
+        self.min_fps = min_fps
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.max_level = max_level
+        self.congested = congested
+        self.level = 0
+        self.send_s = 0.0  # EWMA per frame at the current level
+        self.next_due = 0.0
+        self._changed = self._pressure = time.monotonic()
+        self.skipped = 0
+
+    def due(self, now: float) -> bool:
+        if now >= self.next_due:
+            return True
+        self.skipped += 1
+        return False
+
+    def sent(self, start: float, end: float) -> None:
+        took = end - start
+        self.send_s = took if self.send_s == 0.0 else self.send_s * 0.7 + took * 0.3
+        duty = self.duty
+        if self.congested is not None and self.congested():
+            duty /= 2  # telemetry on this link is already backing up
+        interval = max(self.min_interval, self.send_s / duty)
+        self.next_due = start + interval
+        fps = 1.0 / interval if interval > 0 else float("inf")
+        if fps < self.min_fps * 2:
+            self._pressure = end
+        if end - self._changed < self.DWELL_S:
+            return
+        if fps < self.min_fps and self.level < self.max_level:
+            self._set_level(self.level + 1, end)
+        elif self.level > 0 and end - self._pressure > self.UP_AFTER_S:
+            self._set_level(self.level - 1, end)
+
+    def _set_level(self, level: int, now: float) -> None:
+        # Frame size changes ~4x per level; rescale the estimate instead of starting over.
+        self.send_s *= 4.0 ** (self.level - level)
+        self.level = level
+        self._changed = now
+
+
+class _Subscriber:
+    __slots__ = ("frame", "event", "sent", "dropped")
+
+    def __init__(self) -> None:
+        self.frame: Frame | None = None  # latest undelivered frame
+        self.event = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+
+
+class MjpegRelay:
+    """
+    One upstream MJPEG connection to the camera, fanned out to any number of viewers.
+
+    The ESP32-CAM copes with one or two clients, so browsers watch /video/stream instead
+    of the camera. Each viewer has a single-frame slot: a viewer that is still sending the
+    previous frame when a new one arrives just has its slot overwritten (latest frame
+    wins), so a slow link drops frames instead of queueing them or stalling others. Frames
+    are immutable bytes handed to every viewer as-is.
+
+    The upstream is opened on demand and closed `idle_s` after the last viewer leaves.
+    """
+
+    def __init__(
+        self,
+        get_url: Callable[[], str],
+        *,
+        idle_s: float = DEFAULT_RELAY_IDLE_S,
+        timeout_s: float = DEFAULT_PROBE_TIMEOUT_S * 2,
+    ) -> None:
+        self.get_url = get_url
+        self.idle_s = idle_s
+        self.timeout_s = timeout_s
+        self.latest: Frame | None = None
+        self.content_type = ""
+        self.connected = False
+        self.error: str | None = None
+        self._subs: set[_Subscriber] = set()
+        self._demand = 0.0
+        self._task: asyncio.Task | None = None
+        self._seq = 0
+        # Frame seqs restart with the process; the epoch keeps ETags unique across restarts.
+        self.epoch = format(time.time_ns() // 1_000_000, "x")
+        # stats
+        self.connects = 0
+        self.frames = 0
+        self.bytes = 0
+        self.dropped = 0
+        self.skipped = 0
+
+    # --- demand ---
+
+    def touch(self) -> None:
+        """Keep (or get) the upstream running for another idle_s."""
+        self._demand = time.monotonic()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="video-relay")
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.connected = False
+        for sub in self._subs:
+            sub.event.set()  # viewers see the relay gone and end their streams
+
+    def _wanted(self) -> bool:
+        return bool(self._subs) or time.monotonic() - self._demand < self.idle_s
+
+    def frame_age_s(self) -> float | None:
+        return None if self.latest is None else time.monotonic() - self.latest.ts
+
+    # --- upstream ---
+
+    async def _run(self) -> None:
+        backoff_s = 0.5
+        while self._wanted():
+            url = str(self.get_url() or "").strip()
+            if not url:
+                self.error = "video_url is empty"
+                await asyncio.sleep(1.0)
+                continue
+            try:
+                await self._pump(url)
+                backoff_s = 0.5
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+            finally:
+                self.connected = False
+            if self._wanted():
+                await asyncio.sleep(backoff_s)
+                backoff_s = min(5.0, backoff_s * 2)
+        self._task = None
+
+    async def _pump(self, url: str) -> None:
+        resp = await http_get(url, self.timeout_s, limit=MAX_FRAME_BYTES)
+        try:
+            if resp.status >= 400:
+                raise HttpError(f"HTTP {resp.status} {resp.reason}")
+            boundary = _boundary(resp.content_type)
+            if boundary is None:
+                raise HttpError(f"Not an MJPEG stream: {resp.content_type or 'no Content-Type'}")
+            self.content_type = resp.content_type
+            self.connected = True
+            self.error = None
+            self.connects += 1
+            async for data in iter_mjpeg(resp.reader, boundary, self.timeout_s):
+                self._publish(data)
+                if not self._wanted() or url != str(self.get_url() or "").strip():
+                    return  # nobody watching, or video_url changed: reopen
+        finally:
+            resp.close()
+
+    def _publish(self, data: bytes) -> None:
+        self._seq += 1
+        frame = Frame(self._seq, time.monotonic(), data)
+        self.latest = frame
+        self.frames += 1
+        self.bytes += len(data)
+        for sub in self._subs:
+            if sub.frame is not None:
+                sub.dropped += 1
+                self.dropped += 1
+            sub.frame = frame
+            sub.event.set()
+
+    async def snapshot(self, max_age_s: float, timeout_s: float) -> Frame | None:
+        """Latest frame if newer than max_age_s, else the next one (None on timeout)."""
+        self.touch()
+        frame = self.latest
+        if frame is not None and time.monotonic() - frame.ts <= max_age_s:
+            return frame
+        waiter = _Subscriber()
+        self._subs.add(waiter)
+        try:
+            await asyncio.wait_for(waiter.event.wait(), timeout_s)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._subs.discard(waiter)
+        return waiter.frame
+
+    # --- viewers ---
+
+    async def subscribe(self) -> AsyncIterator[Frame]:
+        """Frames for one viewer (latest wins); starts the upstream if needed."""
+        sub = _Subscriber()
+        self._subs.add(sub)
+        self.touch()
+        try:
+            if self.latest is not None and time.monotonic() - self.latest.ts < self.idle_s:
+                sub.frame = self.latest  # show something right away
+            while True:
+                if sub.frame is None:
+                    sub.event.clear()
+                    await sub.event.wait()
+                    if self._task is None:  # relay stopped
+                        return
+                frame, sub.frame = sub.frame, None
+                if frame is None:
+                    continue
+                sub.sent += 1
+                yield frame
+        finally:
+            self._subs.discard(sub)
+            self._demand = time.monotonic()
+
+    async def stream(self, pacer: ViewerPacer | None = None, scaler: JpegScaler | None = None) -> AsyncIterator[bytes]:
+        """
+        multipart/x-mixed-replace body for one viewer. With a pacer, frames the viewer's
+        link has no room for are skipped and frames may be sent downscaled by `scaler`.
+        """
+        async for frame in self.subscribe():
+            if pacer is not None:
+                if not pacer.due(time.monotonic()):
+                    self.skipped += 1
+                    continue
+                if scaler is not None and pacer.level:
+                    frame = await scaler.scaled(frame, pacer.level)
+            start = time.monotonic()
+            yield frame.part_header()
+            yield frame.data
+            yield b"\r\n"
+            if pacer is not None:
+                # Resumed once the server has taken the frame: the time spent is the backlog.
+                pacer.sent(start, time.monotonic())
+
+    def stats(self) -> dict[str, Any]:
+        age = self.frame_age_s()
+        return {
+            "connected": self.connected,
+            "error": self.error,
+            "viewers": len(self._subs),
+            "connects": self.connects,
+            "frames": self.frames,
+            "bytes": self.bytes,
+            "dropped": self.dropped,
+            "skipped": self.skipped,
+            "last_frame_age_s": None if age is None else round(age, 2),
+        }
+
+
+class VideoProber:
+    """
+    Checks video_url in the background on a schedule and keeps the last result, so
+    /api/check answers from cache instead of waiting on a dead camera. A changed URL is
+    probed right away.
+    """
+
+    def __init__(
+        self,
+        get_url: Callable[[], str],
+        *,
+        interval_s: float = DEFAULT_PROBE_INTERVAL_S,
+        timeout_s: float = DEFAULT_PROBE_TIMEOUT_S,
+        relay: MjpegRelay | None = None,
+    ) -> None:
+        self.get_url = get_url
+        self.interval_s = interval_s
+        self.timeout_s = timeout_s
+        # While the relay is receiving frames the camera is evidently fine; don't open
+        # another connection to it.
+        self.relay = relay
+        self._result: dict[str, Any] | None = None
+        self._url: str | None = None
+        self._checked = 0.0
+        self._probe_ms = 0.0
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="video-probe")
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            url = str(self.get_url() or "").strip()
+            if url != self._url or time.monotonic() - self._checked >= self.interval_s:
+                t0 = time.monotonic()
+                relay = self.relay
+                age = None if relay is None else relay.frame_age_s()
+                if relay is not None and relay.connected and age is not None and age < self.timeout_s:
+                    result = {"configured": True, "ok": True, "content_type": relay.content_type, "source": "relay"}
+                else:
+                    result = await probe_video_url(url, self.timeout_s)
+                self._url, self._result = url, result
+                self._checked = time.monotonic()
+                self._probe_ms = (self._checked - t0) * 1000.0
+            await asyncio.sleep(min(1.0, self.interval_s))
+
+    def result(self) -> dict[str, Any]:
+        if self._result is None:
+            return {"configured": bool(str(self.get_url() or "").strip()), "ok": False, "error": "not probed yet"}
+        return {
+            **self._result,
+            "age_s": round(time.monotonic() - self._checked, 1),
+            "probe_ms": round(self._probe_ms, 1),
+        }
@@ -28,9 +28,79 @@ async function loadConfig() {
   return cfg;
 }
 
+// Open the page with ?vehicle=<id> to control another vehicle (see /api/vehicles); default: the first one.
+const VEHICLE = new URLSearchParams(location.search).get("vehicle") || "";
+
+function vehicleParam(sep) {
+  return VEHICLE ? `${sep}vehicle=${encodeURIComponent(VEHICLE)}` : "";
+}
+
 function wsUrl() {
   const proto = location.protocol === "https:" ? "wss" : "ws";
-  return `${proto}://${location.host}/ws`;
+  // delta=1: server sends only changed fields between periodic keyframes
+  // Open the page with ?encoding=msgpack for binary telemetry (JSON stays default for debugging).
+  const encoding = new URLSearchParams(location.search).get("encoding") === "msgpack" ? "&encoding=msgpack" : "";
+  return `${proto}://${location.host}/ws?delta=1${encoding}${vehicleParam("&")}`;
+}
+
+// Minimal MessagePack decoder (counterpart of backend/codec.py).
+function msgpackDecode(buf) {
+  const view = new DataView(buf);
+  const bytes = new Uint8Array(buf);
+  const utf8 = new TextDecoder();
+  let pos = 0;
+
+  function str(n) {
+    const s = utf8.decode(bytes.subarray(pos, pos + n));
+    pos += n;
+    return s;
+  }
+  function arr(n) {
+    const a = new Array(n);
+    for (let i = 0; i < n; i++) a[i] = read();
+    return a;
+  }
+  function map(n) {
+    const o = {};
+    for (let i = 0; i < n; i++) {
+      const k = read();
+      o[k] = read();
+    }
+    return o;
+  }
+  function read() {
+    const b = bytes[pos++];
+    if (b <= 0x7f) return b;
+    if (b >= 0xe0) return b - 0x100;
+    if ((b & 0xf0) === 0x80) return map(b & 0x0f);
+    if ((b & 0xf0) === 0x90) return arr(b & 0x0f);
+    if ((b & 0xe0) === 0xa0) return str(b & 0x1f);
+    let v;
+    switch (b) {
+      case 0xc0: return null;
+      case 0xc2: return false;
+      case 0xc3: return true;
+      case 0xca: v = view.getFloat32(pos); pos += 4; return v;
+      case 0xcb: v = view.getFloat64(pos); pos += 8; return v;
+      case 0xcc: return bytes[pos++];
+      case 0xcd: v = view.getUint16(pos); pos += 2; return v;
+      case 0xce: v = view.getUint32(pos); pos += 4; return v;
+      case 0xcf: v = Number(view.getBigUint64(pos)); pos += 8; return v;
+      case 0xd0: v = view.getInt8(pos); pos += 1; return v;
+      case 0xd1: v = view.getInt16(pos); pos += 2; return v;
+      case 0xd2: v = view.getInt32(pos); pos += 4; return v;
+      case 0xd3: v = Number(view.getBigInt64(pos)); pos += 8; return v;
+      case 0xd9: v = bytes[pos++]; return str(v);
+      case 0xda: v = view.getUint16(pos); pos += 2; return str(v);
+      case 0xdb: v = view.getUint32(pos); pos += 4; return str(v);
+      case 0xdc: v = view.getUint16(pos); pos += 2; return arr(v);
+      case 0xdd: v = view.getUint32(pos); pos += 4; return arr(v);
+      case 0xde: v = view.getUint16(pos); pos += 2; return map(v);
+      case 0xdf: v = view.getUint32(pos); pos += 4; return map(v);
+      default: throw new Error(`msgpack: unsupported byte 0x${b.toString(16)}`);
+    }
+  }
+  return read();
 }
 
 function setVideoVisible(visible) {
@@ -113,11 +183,25 @@ function initMapOnce() {
     window.__mavMapFollow = !window.__mavMapFollow;
     $("btnMapFollow").textContent = window.__mavMapFollow ? "Follow: ON" : "Follow: OFF";
   });
+
+  loadTrackHistory().catch((e) => logLine(`История трека: ${e}`));
 }
 
-function pushGpsPoint(lat, lon) {
+// Prefill the track from the backend ring buffer (last 30 min) instead of starting empty.
+async function loadTrackHistory() {
+  const from = Date.now() / 1000 - 30 * 60;
+  const res = await fetch(`/api/history?fields=gps.lat,gps.lon&from=${from}&max_points=2000${vehicleParam("&")}`, { cache: "no-store" });
+  const j = await res.json();
+  const lat = (j.fields || {})["gps.lat"];
+  const lon = (j.fields || {})["gps.lon"];
+  if (!lat || !lon) return;
+  const n = Math.min(lat.v.length, lon.v.length);
+  for (let i = 0; i < n; i++) pushGpsPoint(lat.v[i], lon.v[i], lat.t[i] * 1000);
+}
+
+function pushGpsPoint(lat, lon, ts = Date.now()) {
   if (!window.__mavMap || !window.__mavTrack) return;
-  const p = { lat, lon, ts: Date.now() };
+  const p = { lat, lon, ts };
   const track = window.__mavTrack;
   const last = track.length ? track[track.length - 1] : null;
   if (last) {
@@ -154,8 +238,9 @@ async function main() {
     const cfg = await loadConfig();
     const videoUrl = (cfg.video_url || "").trim();
     if (videoUrl) {
-      $("video").src = videoUrl;
-      $("videoHint").textContent = `Видео: ${videoUrl}`;
+      // The backend relay holds the only connection to the camera and fans it out.
+      $("video").src = cfg.video_relay ? "/video/stream" : videoUrl;
+      $("videoHint").textContent = cfg.video_relay ? `Видео: ${videoUrl} (через сервер)` : `Видео: ${videoUrl}`;
     } else {
       $("videoHint").textContent = "В config.json не задан video_url";
       logLine("config.json: video_url пустой");
@@ -166,6 +251,7 @@ async function main() {
   }
 
   const ws = new WebSocket(wsUrl());
+  ws.binaryType = "arraybuffer";
 
   ws.addEventListener("open", () => {
     $("wsStatus").textContent = "WS: connected";
@@ -261,23 +347,35 @@ async function main() {
     timer: null,
   };
 
+  // The backend streams RC_CHANNELS_OVERRIDE at a fixed rate from the latest target;
+  // we only send the target on change plus a keepalive faster than its deadman timeout.
   function sendDriveOnce() {
-    send("rc_override", { steering_pwm: drive.steering_pwm, throttle_pwm: drive.throttle_pwm });
+    if (ws.readyState !== WebSocket.OPEN) return;
+    ws.send(JSON.stringify({ type: "rc", steering_pwm: drive.steering_pwm, throttle_pwm: drive.throttle_pwm }));
+  }
+
+  function releaseDrive() {
+    if (ws.readyState !== WebSocket.OPEN) return;
+    ws.send(JSON.stringify({ type: "rc", release: true }));
   }
 
   function ensureDriveLoop() {
-    if (drive.timer) return;
     sendDriveOnce();
-    drive.timer = setInterval(sendDriveOnce, 200);
+    if (drive.timer) return;
+    drive.timer = setInterval(sendDriveOnce, 150);
   }
 
   function maybeStopLoop() {
-    if (drive.steerActive || drive.throttleActive) return;
+    if (drive.steerActive || drive.throttleActive) {
+      sendDriveOnce();
+      return;
+    }
     if (drive.timer) clearInterval(drive.timer);
     drive.timer = null;
     drive.steering_pwm = PWM.steerCenter;
     drive.throttle_pwm = PWM.thrStop;
     sendDriveOnce();
+    releaseDrive();
   }
 
   function setSteer(pwm, active) {
@@ -310,6 +408,7 @@ async function main() {
     drive.steering_pwm = PWM.steerCenter;
     drive.throttle_pwm = PWM.thrStop;
     sendDriveOnce();
+    releaseDrive();
   }
 
   function bindAxisHold(btn, onDown, onUp) {
@@ -351,10 +450,11 @@ async function main() {
   async function runCheck() {
     $("checkHint").textContent = "Проверяю...";
     try {
-      const res = await fetch("/api/check", { cache: "no-store" });
+      const res = await fetch(`/api/check${vehicleParam("?")}`, { cache: "no-store" });
       const j = await res.json();
       const v = j.video || {};
-      $("perVideo").textContent = v.ok ? `OK (${v.content_type || "?"})` : `FAIL: ${v.error || "unknown"}`;
+      const age = v.age_s != null ? `, ${v.age_s} с назад` : "";
+      $("perVideo").textContent = v.ok ? `OK (${v.content_type || "?"}${age})` : `FAIL: ${v.error || "unknown"}${age}`;
       const m = j.mavlink || {};
       logLine(`CHECK: mavlink.connected=${m.connected} ping=${m.ping?.ok ? "ok" : "fail"}`);
       $("checkHint").textContent = "Готово.";
@@ -365,10 +465,13 @@ async function main() {
   }
   $("btnCheck").addEventListener("click", runCheck);
 
+  // Merged telemetry state (keyframes replace it, deltas patch top-level fields).
+  let telemetry = null;
+
   ws.addEventListener("message", (ev) => {
     let msg;
     try {
-      msg = JSON.parse(ev.data);
+      msg = typeof ev.data === "string" ? JSON.parse(ev.data) : msgpackDecode(ev.data);
     } catch {
       return;
     }
@@ -386,20 +489,40 @@ async function main() {
     }
 
     if (msg.type === "command_result") {
-      if (msg.ok) logLine(`Команда OK`);
-      else logLine(`Команда ERROR: ${msg.message || "unknown"}`);
+      const ack = msg.result
+        ? ` (${msg.command}: ${msg.result}, попыток ${msg.attempts}` +
+          (msg.latency_ms != null ? `, ${msg.latency_ms} мс` : "") + ")"
+        : "";
+      if (msg.ok) logLine(`Команда OK${ack}`);
+      else logLine(`Команда ERROR: ${msg.message || "unknown"}${ack}`);
       return;
     }
 
-    if (msg.type !== "telemetry") return;
+    let changed;
+    if (msg.type === "telemetry") {
+      telemetry = msg.data || {};
+      changed = telemetry;
+    } else if (msg.type === "telemetry_delta") {
+      if (!telemetry) {
+        ws.send(JSON.stringify({ type: "resync" }));
+        return;
+      }
+      changed = msg.data || {};
+      Object.assign(telemetry, changed);
+    } else {
+      return;
+    }
 
-    const t = msg.data || {};
+    const t = telemetry;
     $("linkStatus").textContent = `MAVLink: ${t.connected ? "connected" : "disconnected"}`;
     $("armedStatus").textContent = `ARM: ${t.armed === null || t.armed === undefined ? "—" : t.armed ? "ARMED" : "DISARMED"}`;
     $("modeStatus").textContent = `MODE: ${t.mode || "—"}`;
 
     $("speed").textContent = fmt(t.groundspeed_m_s, " m/s");
     $("heading").textContent = fmt(t.heading_deg, "°");
+    const att = t.attitude || {};
+    $("attitude").textContent =
+      att.roll_deg == null || att.pitch_deg == null ? "—" : `${att.roll_deg.toFixed(1)}° / ${att.pitch_deg.toFixed(1)}°`;
 
     const b = t.battery || {};
     const battParts = [];
@@ -439,10 +562,12 @@ async function main() {
       if (window.__mavMapInit) pushGpsPoint(Number(g.lat), Number(g.lon));
     }
 
-    const errs = (t.errors || []).slice(0, 3);
-    const warns = (t.warnings || []).slice(0, 3);
-    if (errs.length) logLine(`ERROR: ${errs[0]}`);
-    else if (warns.length) logLine(`WARN: ${warns[0]}`);
+    if ("errors" in changed || "warnings" in changed) {
+      const errs = (t.errors || []).slice(0, 3);
+      const warns = (t.warnings || []).slice(0, 3);
+      if (errs.length) logLine(`ERROR: ${errs[0]}`);
+      else if (warns.length) logLine(`WARN: ${warns[0]}`);
+    }
   });
 }
 
@@ -0,0 +1,67 @@
+"""
+Micro-benchmark for the telemetry hot path (handle_mavlink_message).
+
+Run from mavrover_web/:
+    python -m tools.bench_telemetry [--rounds 2000] [--repeat 7]
+
+Feeds a realistic mix of decoded pymavlink messages (handled and ignored types, as an
+ArduPilot link at default stream rates would send them) and prints the best messages/sec.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from pymavlink.dialects.v20 import ardupilotmega as mavlink2
+
+from backend.telemetry import TelemetryState, handle_mavlink_message
+
+
+def _sample_messages() -> list:
+    m = mavlink2
+    msgs = [
+        m.MAVLink_heartbeat_message(m.MAV_TYPE_GROUND_ROVER, m.MAV_AUTOPILOT_ARDUPILOTMEGA, 129, 0, 4, 3),
+        m.MAVLink_sys_status_message(0x3FFF, 0x3FFF, 0x3FFF, 250, 12400, 320, 87, 0, 0, 0, 0, 0, 0),
+        m.MAVLink_statustext_message(6, b"PreArm: test message"),
+    ]
+    for i in range(10):
+        msgs += [
+            m.MAVLink_gps_raw_int_message(0, 3, 501234567 + i, 301234567 + i, 120000, 90, 120, 150, 0, 11),
+            m.MAVLink_vfr_hud_message(0.0, 1.0 + i / 10, 90 + i, 40, 120.0, 0.0),
+            m.MAVLink_attitude_message(0, 0.01 * i, 0.02, 1.5, 0.0, 0.0, 0.0),
+            m.MAVLink_global_position_int_message(0, 501234567, 301234567, 120000, 2000, 0, 0, 0, 9000),
+            m.MAVLink_raw_imu_message(0, 1, 2, 1000, 0, 0, 0, 100, 100, 100),
+            m.MAVLink_servo_output_raw_message(0, 0, *([1500] * 8)),
+            m.MAVLink_rc_channels_message(0, 8, *([1500] * 18), 255),
+        ]
+    return msgs
+
+
+def _run(state: TelemetryState, msgs: list, rounds: int, batch: int, publish: bool) -> float:
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for i, msg in enumerate(msgs, 1):
+            handle_mavlink_message(state, msg)
+            if publish and i % batch == 0:
+                state.publish()
+    return rounds * len(msgs) / (time.perf_counter() - t0)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=2000, help="passes over the message mix per repeat")
+    ap.add_argument("--repeat", type=int, default=7, help="best-of-N (timeit style)")
+    ap.add_argument("--batch", type=int, default=20, help="messages per publish()")
+    args = ap.parse_args()
+
+    msgs = _sample_messages()
+    state = TelemetryState()
+
+    for label, publish in (("handle only", False), ("handle + publish", True)):
+        best = max(_run(state, msgs, args.rounds, args.batch, publish) for _ in range(args.repeat))
+        print(f"{label:18s} {best:12,.0f} msg/s  (best of {args.repeat} x {args.rounds * len(msgs)} messages)")
+
+
+if __name__ == "__main__":
+    main()
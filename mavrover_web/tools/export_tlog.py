@@ -0,0 +1,52 @@
+"""
+Export a recorded tlog into columnar per-message-type tables (.npz).
+
+Run from mavrover_web/:
+    python -m tools.export_tlog logs/<file>.tlog [-o out.npz] [--types GPS_RAW_INT,ATTITUDE]
+                                                 [--from <unix s>] [--to <unix s>] [--no-compress]
+
+Load with numpy:
+    d = np.load("out.npz"); d["GPS_RAW_INT/t"], d["GPS_RAW_INT/gps.lat"], d["ATTITUDE/roll"]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+
+from backend.export import decode_columns, write_npz
+from backend.logstore import LogStore
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("tlog", type=Path)
+    ap.add_argument("-o", "--output", type=Path, default=None)
+    ap.add_argument("--types", default="", help="comma-separated message types (default: all)")
+    ap.add_argument("--from", dest="t_from", type=float, default=None)
+    ap.add_argument("--to", dest="t_to", type=float, default=None)
+    ap.add_argument("--no-compress", action="store_true")
+    args = ap.parse_args()
+
+    path: Path = args.tlog.resolve()
+    out: Path = args.output or path.with_suffix(".npz")
+    types = [t for t in args.types.split(",") if t.strip()] or None
+
+    t0 = time.perf_counter()
+    tables = decode_columns(LogStore(path.parent), path.name, types, args.t_from, args.t_to)
+    t1 = time.perf_counter()
+    with open(out, "wb") as f:
+        write_npz(tables, f, compress=not args.no_compress)
+    t2 = time.perf_counter()
+
+    rows = 0
+    for msgtype, table in sorted(tables.items()):
+        n = table["t"].shape[0]
+        rows += n
+        print(f"{msgtype:<28} {n:>9} rows  {len(table):>3} columns")
+    print(f"{rows} rows -> {out} (decode {t1 - t0:.2f} s, write {t2 - t1:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()